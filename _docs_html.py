@@ -245,6 +245,7 @@ code {
 .status-422 { color: #ca8a04; }
 .status-429 { color: #9333ea; }
 .status-502 { color: #dc2626; }
+.status-503 { color: #dc2626; }
 .status-504 { color: #dc2626; }
 
 /* CMS Grid */
@@ -333,6 +334,7 @@ code {
           <thead><tr><th>Name</th><th>In</th><th>Type</th><th>Required</th><th>Description</th></tr></thead>
           <tbody>
             <tr><td><code>domain</code></td><td>query</td><td><code>string</code></td><td>Yes</td><td>Domain to check, e.g. <code>example.com</code></td></tr>
+            <tr><td><code>timings</code></td><td>query</td><td><code>boolean</code></td><td>No</td><td>Set to <code>1</code> to include per-stage <code>timings</code> (ms) in the response</td></tr>
           </tbody>
         </table>
       </div>
@@ -341,6 +343,27 @@ code {
       <pre id="curl-detect"></pre>
     </div>
 
+    <div class="endpoint-block">
+      <div><span class="method-badge">POST</span><span class="endpoint-path">/api/detect/batch</span></div>
+      <p class="endpoint-desc">Detect the CMS for a list of domains. Returns one result per domain, in request order; each result has the single-domain fields plus its own <code>status</code>.</p>
+      <h3 style="font-size:0.95rem; margin-bottom:0.4rem;">Body</h3>
+      <div class="table-wrap">
+        <table>
+          <thead><tr><th>Name</th><th>In</th><th>Type</th><th>Required</th><th>Description</th></tr></thead>
+          <tbody>
+            <tr><td><code>domains</code></td><td>body</td><td><code>string[]</code></td><td>Yes</td><td>Domains to check (max 1000 by default)</td></tr>
+          </tbody>
+        </table>
+      </div>
+      <h3 style="font-size:0.95rem; margin-top:1rem; margin-bottom:0.4rem;">Example</h3>
+      <pre id="curl-batch"></pre>
+    </div>
+    <div class="endpoint-block">
+      <div><span class="method-badge">POST</span><span class="endpoint-path">/api/detect/stream</span></div>
+      <p class="endpoint-desc">Same input as <code>/api/detect/batch</code>, or a plain-text body with one domain per line. Streams NDJSON (<code>application/x-ndjson</code>): one result line per domain, in completion order.</p>
+      <h3 style="font-size:0.95rem; margin-top:0.5rem; margin-bottom:0.4rem;">Example</h3>
+      <pre id="curl-stream"></pre>
+    </div>
     <div class="endpoint-block">
       <div><span class="method-badge">GET</span><span class="endpoint-path">/api/health</span></div>
       <p class="endpoint-desc">Health check for deployment verification.</p>
@@ -367,6 +390,8 @@ code {
           <tr><td><code>confidence</code></td><td><code>integer</code></td><td>Confidence score 0&ndash;100</td></tr>
           <tr><td><code>signals</code></td><td><code>string[]</code></td><td>List of matched detection signals</td></tr>
           <tr><td><code>version</code></td><td><code>string | null</code></td><td>CMS version if detected, otherwise <code>null</code></td></tr>
+          <tr><td><code>scores</code></td><td><code>object[]</code></td><td>Every CMS with its <code>score</code> and <code>confidence</code>, best first</td></tr>
+          <tr><td><code>technologies</code></td><td><code>object</code></td><td>Other technologies by category (<code>cdn</code>, <code>analytics</code>, <code>ecommerce</code>, <code>js_framework</code>): each a list of <code>{name, confidence, signals}</code>, best first</td></tr>
           <tr><td><code>elapsed_ms</code></td><td><code>integer</code></td><td>Server-side processing time in milliseconds</td></tr>
         </tbody>
       </table>
@@ -384,6 +409,16 @@ code {
     "html: /wp-includes/ found"
   ],
   "version": "6.5",
+  "scores": [
+    {"cms": "WordPress", "score": 85, "confidence": 87},
+    {"cms": "Drupal", "score": 0, "confidence": 0}
+  ],
+  "technologies": {
+    "cdn": [{"name": "Cloudflare", "confidence": 63, "signals": ["header: Server: cloudflare", "header: CF-Ray present"]}],
+    "analytics": [{"name": "Google Tag Manager", "confidence": 54, "signals": ["script: gtm.js"]}],
+    "ecommerce": [],
+    "js_framework": [{"name": "jQuery", "confidence": 100, "signals": ["script: jquery.js"]}]
+  },
   "elapsed_ms": 412
 }</pre>
   </section>
@@ -410,6 +445,11 @@ code {
             <td>Could not reach the target domain (DNS failure, connection refused, etc.)</td>
             <td><code>error</code>, <code>detail</code>, <code>domain</code>, <code>elapsed_ms</code></td>
           </tr>
+          <tr>
+            <td><span class="status status-503">503</span></td>
+            <td>The target's host recently answered 429/503 and we are backing off from it, or too many requests to it are already queued</td>
+            <td><code>error</code>, <code>detail</code>, <code>domain</code>, <code>retry_after</code>, <code>elapsed_ms</code></td>
+          </tr>
           <tr>
             <td><span class="status status-504">504</span></td>
             <td>Target domain took too long to respond (timeout)</td>
@@ -434,7 +474,7 @@ code {
         </tbody>
       </table>
     </div>
-    <p style="color:#555; margin-top:0.75rem;">Default limit: <strong>5 requests per 60 seconds</strong>. When exceeded, the API returns HTTP <code>429</code>.</p>
+    <p style="color:#555; margin-top:0.75rem;">Default limit: <strong>5 requests per 60 seconds</strong>. When exceeded, the API returns HTTP <code>429</code>. Each domain of a batch or stream counts as one request, and the whole list must fit in the remaining allowance.</p>
   </section>
 
   <!-- Supported CMS Platforms -->
@@ -456,6 +496,8 @@ code {
   document.getElementById('base-url').textContent = BASE;
   document.getElementById('curl-detect').textContent = 'curl "' + BASE + '/api/detect?domain=techcrunch.com"';
   document.getElementById('curl-health').textContent = 'curl "' + BASE + '/api/health"';
+  document.getElementById('curl-stream').textContent = 'curl -N -X POST "' + BASE + '/api/detect/stream" -H "Content-Type: text/plain" --data-binary @domains.txt';
+  document.getElementById('curl-batch').textContent = 'curl -X POST "' + BASE + '/api/detect/batch" -H "Content-Type: application/json" -d \\'{"domains": ["techcrunch.com", "shopify.com"]}\\'';
 
   // CMS cards
   var platforms = [
@@ -559,6 +601,21 @@ code {
       html += '</ul></div>';
     }
 
+    // Other technologies
+    var techs = [];
+    Object.keys(data.technologies || {}).forEach(function(category) {
+      data.technologies[category].forEach(function(t) {
+        techs.push(category + ': ' + t.name + ' (' + t.confidence + '%)');
+      });
+    });
+    if (techs.length) {
+      html += '<div class="result-row"><span class="result-label">Technologies</span><ul class="signals-list">';
+      techs.forEach(function(t) {
+        html += '<li>' + escapeHtml(t) + '</li>';
+      });
+      html += '</ul></div>';
+    }
+
     // Timing
     html += '<div class="result-row"><span class="result-label">Domain</span><span class="result-value">' + escapeHtml(data.domain) + '</span></div>';
     html += '<div class="result-row"><span class="result-label">URL checked</span><span class="result-value" style="word-break:break-all">' + escapeHtml(data.url_checked) + '</span></div>';
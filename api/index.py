@@ -1,23 +1,300 @@
 """FastAPI endpoint for CMS detection."""
 
+import asyncio
 import collections
-import threading
+import json
+import math
 import time
 import sys
 import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
 # Add parent directory to path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from detector import normalize_domain, fetch_page, detect_cms
+from detector import (
+    normalize_domain,
+    fetch_page,
+    detect_cms_async,
+    create_client,
+    create_detect_pool,
+    probe_page,
+    probe_paths,
+)
+from result_cache import CachedResult, MemoryCacheBackend, ResultCache, SQLiteCacheBackend
+from coalesce import RequestCoalescer
+from dns_cache import DNSCache
+from metrics import Registry
+from politeness import BackingOff, PolitenessScheduler, SlotUnavailable, resolve_ip
+from rate_limit import (
+    Decision,
+    MemoryRateLimitBackend,
+    RateLimiter,
+    SQLiteRateLimitBackend,
+)
 from _docs_html import INDEX_HTML
 import httpx
 
-app = FastAPI(title="CMS Detection API", version="1.0.0")
+# --- Outbound HTTP client pool (configurable via environment variables) ---
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "0") == "1"
+
+# --- Result cache, keyed by normalized domain (configurable via environment variables) ---
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "86400"))
+CACHE_NEGATIVE_TTL = float(os.environ.get("CACHE_NEGATIVE_TTL", "600"))
+CACHE_ERROR_TTL = float(os.environ.get("CACHE_ERROR_TTL", "60"))
+# "memory" (per process) or "sqlite" (shared on-disk file, survives restarts)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.environ.get("CACHE_SQLITE_PATH", "/tmp/cms-detect-cache.sqlite3")
+CACHE_WRITE_BATCH = int(os.environ.get("CACHE_WRITE_BATCH", "50"))
+# Longest a result waits in the sqlite backend's buffer before it is written
+CACHE_MAX_WRITE_DELAY = float(os.environ.get("CACHE_MAX_WRITE_DELAY", "1"))
+
+if CACHE_BACKEND == "sqlite":
+    _cache_backend = SQLiteCacheBackend(
+        CACHE_SQLITE_PATH, write_batch=CACHE_WRITE_BATCH, max_write_delay=CACHE_MAX_WRITE_DELAY
+    )
+else:
+    _cache_backend = MemoryCacheBackend(max_entries=CACHE_MAX_ENTRIES)
+
+_result_cache = ResultCache(
+    _cache_backend,
+    ttl=CACHE_TTL,
+    negative_ttl=CACHE_NEGATIVE_TTL,
+    error_ttl=CACHE_ERROR_TTL,
+)
+
+# Concurrent lookups of one normalized domain share a single fetch.
+_inflight = RequestCoalescer()
+
+# Stop downloading a page once the leading CMS is ahead by this many points
+# (header + HTML signals seen so far). Unset or 0 reads the full capped body.
+STREAM_CERTAINTY_MARGIN = int(os.environ.get("STREAM_CERTAINTY_MARGIN", "0")) or None
+
+# Start the HTTP attempt alongside HTTPS if HTTPS has not connected within
+# this many milliseconds. 0 waits for HTTPS to fail before trying HTTP.
+HAPPY_EYEBALLS_DELAY = int(os.environ.get("HAPPY_EYEBALLS_DELAY_MS", "300")) / 1000 or None
+
+# Run detect_cms in a pool of this many worker processes so CPU-bound
+# scans of large pages do not stall fetches. 0 runs detection inline.
+DETECT_WORKERS = int(os.environ.get("DETECT_WORKERS", "0"))
+_detect_pool = None
+
+# Evaluate every HTML check of every CMS. By default checks of CMSes that
+# the header, cookie and generator evidence already rules out are skipped:
+# the detected CMS, confidence, signals and version are the same, but the
+# scores of ruled-out CMSes may be low.
+DETECT_FULL_SCORES = os.environ.get("DETECT_FULL_SCORES", "0") == "1"
+
+# When the homepage leaves the result open (nothing detected despite some
+# signal, or the leader within PROBE_MARGIN points of the runner-up),
+# fetch up to PROBE_MAX_REQUESTS secondary paths (/wp-json/, /robots.txt,
+# ...) of the PROBE_CANDIDATES best-scoring CMSes, waiting at most
+# PROBE_TIMEOUT seconds. PROBE_MAX_REQUESTS=0 disables probing.
+PROBE_MAX_REQUESTS = int(os.environ.get("PROBE_MAX_REQUESTS", "3"))
+PROBE_CANDIDATES = int(os.environ.get("PROBE_CANDIDATES", "2"))
+PROBE_MARGIN = int(os.environ.get("PROBE_MARGIN", "20"))
+PROBE_TIMEOUT = float(os.environ.get("PROBE_TIMEOUT", "3"))
+
+# --- DNS cache shared by fetches and the politeness scheduler ---
+# Answers are kept for their record TTL (with aiodns installed) or
+# DNS_DEFAULT_TTL, clamped to DNS_MAX_TTL; failed lookups for
+# DNS_NEGATIVE_TTL. Streams resolve the next DNS_PREFETCH_AHEAD domains
+# ahead of fetching them. DNS_CACHE_MAX_ENTRIES=0 disables the cache.
+DNS_CACHE_MAX_ENTRIES = int(os.environ.get("DNS_CACHE_MAX_ENTRIES", "10000"))
+DNS_DEFAULT_TTL = float(os.environ.get("DNS_DEFAULT_TTL", "60"))
+DNS_MAX_TTL = float(os.environ.get("DNS_MAX_TTL", "3600"))
+DNS_NEGATIVE_TTL = float(os.environ.get("DNS_NEGATIVE_TTL", "30"))
+DNS_PREFETCH_AHEAD = int(os.environ.get("DNS_PREFETCH_AHEAD", "50"))
+
+_dns_cache = None
+if DNS_CACHE_MAX_ENTRIES > 0:
+    _dns_cache = DNSCache(
+        default_ttl=DNS_DEFAULT_TTL,
+        max_ttl=DNS_MAX_TTL,
+        negative_ttl=DNS_NEGATIVE_TTL,
+        max_entries=DNS_CACHE_MAX_ENTRIES,
+    )
+
+
+def _prefetch_dns(domain: str) -> None:
+    """Start resolving ``domain`` so its fetch finds the answer cached."""
+    if _dns_cache is None:
+        return
+    try:
+        _dns_cache.prefetch(normalize_domain(domain))
+    except ValueError:
+        pass
+
+
+# --- Outbound politeness (configurable via environment variables) ---
+# Concurrent fetches per registrable domain (a.myshopify.com and
+# b.myshopify.com count together) and per resolved IP; 0 disables a cap.
+POLITENESS_PER_DOMAIN = int(os.environ.get("POLITENESS_PER_DOMAIN", "4"))
+POLITENESS_PER_IP = int(os.environ.get("POLITENESS_PER_IP", "8"))
+# Minimum gap between request starts to one registrable domain.
+POLITENESS_MIN_DELAY = int(os.environ.get("POLITENESS_MIN_DELAY_MS", "100")) / 1000
+# Longest pause after an origin answers 429/503, and longest a request
+# waits for one before failing with 503 instead.
+POLITENESS_BACKOFF_MAX = float(os.environ.get("POLITENESS_BACKOFF_MAX", "300"))
+POLITENESS_MAX_WAIT = float(os.environ.get("POLITENESS_MAX_WAIT", "10"))
+
+_politeness = PolitenessScheduler(
+    per_domain=POLITENESS_PER_DOMAIN,
+    per_ip=POLITENESS_PER_IP,
+    min_delay=POLITENESS_MIN_DELAY,
+    backoff_max=POLITENESS_BACKOFF_MAX,
+    max_wait=POLITENESS_MAX_WAIT,
+    resolve=_dns_cache.first_address if _dns_cache is not None else resolve_ip,
+)
+
+# --- Metrics, exposed in Prometheus format at /api/metrics ---
+# Each worker aggregates its own. With several workers, point METRICS_DIR at
+# a directory they share: each writes a snapshot there every
+# METRICS_FLUSH_INTERVAL seconds and a scrape of any worker sums them all.
+# Gauges of a snapshot not refreshed for METRICS_STALE_INTERVALS flushes
+# (a killed worker) are left out of the sum.
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_STALE_INTERVALS = 3
+
+_metrics = Registry()
+_requests_total = _metrics.counter(
+    "cms_api_requests_total", "Detect API responses by endpoint and status.", ("endpoint", "status")
+)
+_request_seconds = _metrics.histogram(
+    "cms_api_request_duration_seconds", "Detect API request latency.", ("endpoint",)
+)
+_rate_limited_total = _metrics.counter(
+    "cms_rate_limited_total", "Requests rejected by the rate limiter."
+)
+_results_total = _metrics.counter(
+    "cms_domain_results_total", "Per-domain results (single, batch and stream) by status.", ("status",)
+)
+_detected_total = _metrics.counter(
+    "cms_detected_total", "Successful per-domain results by detected CMS.", ("cms",)
+)
+_technologies_total = _metrics.counter(
+    "cms_technologies_detected_total",
+    "Other technologies found in successful per-domain results.",
+    ("category", "technology"),
+)
+_cache_lookups_total = _metrics.counter(
+    "cms_cache_lookups_total", "Result cache lookups (joined in-flight fetches count as hits).", ("result",)
+)
+_fetch_seconds = _metrics.histogram(
+    "cms_fetch_duration_seconds", "Page fetch latency by outcome (ok, timeout, error).", ("outcome",)
+)
+_fetch_bytes_total = _metrics.counter(
+    "cms_fetch_bytes_total", "Response body bytes downloaded."
+)
+_probe_requests_total = _metrics.counter(
+    "cms_probe_requests_total", "Secondary path probes sent for ambiguous homepages."
+)
+_detect_seconds = _metrics.histogram(
+    "cms_detect_seconds",
+    "Detection time per page, wall clock (generator parse, matching, scoring).",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5),
+)
+_metrics.gauge("cms_inflight_fetches", "Distinct domains being fetched right now.", lambda: len(_inflight))
+if _dns_cache is not None:
+    _metrics.gauge("cms_dns_cache_entries", "Hostnames in the DNS cache.", lambda: len(_dns_cache))
+
+# Responses of these paths are counted in cms_api_requests_total.
+_METERED_PATHS = frozenset({"/api/detect", "/api/detect/batch", "/api/detect/stream"})
+
+
+async def _flush_metrics() -> None:
+    """Publish this worker's metrics snapshot to METRICS_DIR periodically."""
+    while True:
+        _metrics.write_snapshot(METRICS_DIR)
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+
+
+async def _flush_result_cache() -> None:
+    """Write out cache results buffered for CACHE_MAX_WRITE_DELAY, even when idle."""
+    while True:
+        await asyncio.sleep(CACHE_MAX_WRITE_DELAY)
+        _result_cache.flush_due()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own one pooled client for the app's lifetime so fetches share connections.
+
+    With ``DETECT_WORKERS`` set, the detection process pool lives here too.
+    """
+    global _detect_pool
+    if DETECT_WORKERS > 0:
+        _detect_pool = create_detect_pool(DETECT_WORKERS)
+    flusher = None
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        flusher = asyncio.create_task(_flush_metrics())
+    cache_flusher = asyncio.create_task(_flush_result_cache())
+    async with create_client(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        http2=HTTP2_ENABLED,
+        dns_cache=_dns_cache,
+    ) as client:
+        app.state.http_client = client
+        try:
+            yield
+        finally:
+            # Persist any results the cache backend is still buffering.
+            cache_flusher.cancel()
+            _result_cache.flush()
+            if _detect_pool is not None:
+                _detect_pool.shutdown(cancel_futures=True)
+                _detect_pool = None
+            if flusher is not None:
+                flusher.cancel()
+                _metrics.remove_snapshot(METRICS_DIR)
+
+
+app = FastAPI(title="CMS Detection API", version="1.0.0", lifespan=lifespan)
+
+
+class MetricsMiddleware:
+    """Count detect API responses by status and time them (streams until done)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        path = scope.get("path") if scope["type"] == "http" else None
+        if path not in _METERED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _requests_total.inc(endpoint=path, status=str(status))
+            _request_seconds.observe(time.perf_counter() - start, endpoint=path)
+
+
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 
@@ -27,10 +304,18 @@ async def root():
     return INDEX_HTML
 
 
-# --- Rate limiting (configurable via environment variable) ---
+# --- Rate limiting (configurable via environment variables) ---
 RATE_LIMIT_RPM = int(os.environ.get("RATE_LIMIT_RPM", "5"))
-_rate_store: dict[str, list[float]] = collections.defaultdict(list)
-_rate_lock = threading.Lock()
+# "memory" (per process) or "sqlite" (limits shared by workers using the file)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.environ.get("RATE_LIMIT_SQLITE_PATH", "/tmp/cms-detect-ratelimit.sqlite3")
+
+if RATE_LIMIT_BACKEND == "sqlite":
+    _rate_backend = SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH)
+else:
+    _rate_backend = MemoryRateLimitBackend()
+
+_rate_limiter = RateLimiter(RATE_LIMIT_RPM, window=60.0, backend=_rate_backend)
 
 
 def _get_client_ip(request: Request) -> str:
@@ -41,18 +326,26 @@ def _get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-def _check_rate_limit(client_ip: str) -> tuple[bool, int]:
-    """Sliding-window rate limit check. Returns (is_limited, remaining)."""
-    if RATE_LIMIT_RPM <= 0:
-        return False, 0
-    now = time.time()
-    with _rate_lock:
-        timestamps = _rate_store[client_ip]
-        _rate_store[client_ip] = timestamps = [t for t in timestamps if now - t < 60.0]
-        if len(timestamps) >= RATE_LIMIT_RPM:
-            return True, 0
-        timestamps.append(now)
-        return False, RATE_LIMIT_RPM - len(timestamps)
+async def _check_rate_limit(client_ip: str, cost: int = 1) -> Decision:
+    """Sliding-window rate limit check. Returns (is_limited, remaining, retry_after).
+
+    Batches and streams cost one request per domain; callers reject
+    lists longer than RATE_LIMIT_RPM first (see ``_exceeds_rate_limit``).
+    """
+    return await _rate_limiter.check_async(client_ip, cost)
+
+
+def _exceeds_rate_limit(count: int) -> JSONResponse | None:
+    """422 response if ``count`` domains could never fit in RATE_LIMIT_RPM, else None."""
+    if RATE_LIMIT_RPM <= 0 or count <= RATE_LIMIT_RPM:
+        return None
+    return JSONResponse(
+        status_code=422,
+        content={
+            "error": "Too many domains for the rate limit",
+            "detail": f"Each domain counts as one request; maximum {RATE_LIMIT_RPM} per minute",
+        },
+    )
 
 
 @app.get("/api/health")
@@ -61,86 +354,478 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus metrics; covers every worker sharing METRICS_DIR."""
+    return PlainTextResponse(
+        _metrics.render(METRICS_DIR or None, METRICS_STALE_INTERVALS * METRICS_FLUSH_INTERVAL),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _rate_limited_response(retry_after: int, start: float) -> JSONResponse:
+    """429 response returned when a client exceeds RATE_LIMIT_RPM.
+
+    ``start`` is when the handler began (monotonic), for Server-Timing.
+    """
+    _rate_limited_total.inc()
+    return JSONResponse(
+        status_code=429,
+        content={
+            "error": "Rate limit exceeded",
+            "detail": f"Maximum {RATE_LIMIT_RPM} requests per minute",
+            "retry_after": retry_after,
+        },
+        headers={
+            "Retry-After": str(retry_after),
+            "X-RateLimit-Limit": str(RATE_LIMIT_RPM),
+            "X-RateLimit-Remaining": "0",
+            "Server-Timing": _server_timing({}, (time.monotonic() - start) * 1000, False),
+        },
+    )
+
+
+async def _detect_domain(
+    domain: str,
+    client: httpx.AsyncClient | None,
+    timings: dict[str, float] | None = None,
+) -> tuple[int, dict, bool]:
+    """Normalize one domain and detect it, going through the result cache.
+
+    Returns (status_code, content, cache_hit) where content is the JSON
+    body the single-domain endpoint sends for that status. Per-stage
+    timings (ms) of the fetch that produced the result are added to
+    ``timings`` when given; a cache hit has none.
+    """
+    start = time.monotonic()
+
+    # Validate domain
+    try:
+        clean_domain = normalize_domain(domain)
+    except ValueError as e:
+        _results_total.inc(status="422")
+        return 422, {"error": f"Invalid domain: {domain}", "detail": str(e)}, False
+
+    (status_code, content), hit = await _lookup(clean_domain, client)
+    _cache_lookups_total.inc(result="hit" if hit else "miss")
+    _results_total.inc(status=str(status_code))
+    if status_code == 200:
+        _detected_total.inc(cms=content["cms"] or "none")
+        for category, found in content.get("technologies", {}).items():
+            for technology in found:
+                _technologies_total.inc(category=category, technology=technology["name"])
+    # Cached bodies carry the original request's timing; report this one's.
+    content = {**content, "elapsed_ms": int((time.monotonic() - start) * 1000)}
+    stages = content.pop("timings", None)
+    if timings is not None and stages:
+        timings.update(stages)
+    return status_code, content, hit
+
+
+async def _lookup(clean_domain: str, client: httpx.AsyncClient | None) -> tuple[CachedResult, bool]:
+    """Serve a normalized domain from the cache, or fetch it exactly once.
+
+    Returns (value, hit). Callers that joined an in-flight fetch started
+    by another request count as hits.
+    """
+    cached = _result_cache.get(clean_domain)
+    if cached is not None:
+        return cached, True
+
+    async def fetch_and_store() -> CachedResult:
+        value = await _fetch_and_detect(clean_domain, client)
+        status_code, content = value
+        # Politeness 503s are not cached: the scheduler already tracks
+        # backoffs, and a full queue may drain the next moment.
+        if status_code != 503:
+            # Stage timings describe this fetch only, so they are not cached.
+            _result_cache.put(
+                clean_domain,
+                (status_code, {k: v for k, v in content.items() if k != "timings"}),
+            )
+        return value
+
+    return await _inflight.run(clean_domain, fetch_and_store)
+
+
+async def _fetch_and_detect(clean_domain: str, client: httpx.AsyncClient | None) -> tuple[int, dict]:
+    """Fetch and detect a normalized domain. Returns (status_code, content).
+
+    ``content["timings"]`` holds the per-stage timings in ms.
+    """
+    start = queued = time.monotonic()
+
+    # Fetch the page, within the origin's politeness limits
+    try:
+        async with _politeness.slot(clean_domain):
+            queued = time.monotonic()
+            page_data = await fetch_page(
+                clean_domain,
+                client,
+                STREAM_CERTAINTY_MARGIN,
+                happy_eyeballs_delay=HAPPY_EYEBALLS_DELAY,
+            )
+            _politeness.report(
+                clean_domain, page_data.status_code, page_data.headers.get("retry-after")
+            )
+    except SlotUnavailable as e:
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        if isinstance(e, BackingOff):
+            error = f"Not fetching {clean_domain} while its host asks us to back off"
+        else:
+            error = f"Too many requests to {clean_domain} are already queued"
+        return 503, {
+            "error": error,
+            "detail": str(e),
+            "domain": clean_domain,
+            "retry_after": math.ceil(e.retry_after),
+            "elapsed_ms": elapsed_ms,
+            "timings": {},
+        }
+    except httpx.TimeoutException:
+        _fetch_seconds.observe(time.monotonic() - queued, outcome="timeout")
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        return 504, {
+            "error": f"Timeout fetching {clean_domain}",
+            "domain": clean_domain,
+            "elapsed_ms": elapsed_ms,
+            "timings": {"queue": _ms_since(start, queued), "fetch": _ms_since(queued)},
+        }
+    except (httpx.HTTPError, OSError) as e:
+        _fetch_seconds.observe(time.monotonic() - queued, outcome="error")
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        return 502, {
+            "error": f"Could not reach {clean_domain}",
+            "detail": str(e),
+            "domain": clean_domain,
+            "elapsed_ms": elapsed_ms,
+            "timings": {"queue": _ms_since(start, queued), "fetch": _ms_since(queued)},
+        }
+    fetched = time.monotonic()
+    _fetch_seconds.observe(fetched - queued, outcome="ok")
+    _fetch_bytes_total.inc(page_data.bytes_downloaded)
+
+    # Detect CMS. CMSes within PROBE_MARGIN of the leader are scored exactly,
+    # so the decision to probe matches what full scoring would decide.
+    margin = PROBE_MARGIN if PROBE_MAX_REQUESTS > 0 else 0
+    result = await detect_cms_async(page_data, _detect_pool, DETECT_FULL_SCORES, margin)
+    detected = time.monotonic()
+
+    # Ask the site's cheap secondary paths when the homepage is not enough
+    probe_timings = {}
+    paths = []
+    if PROBE_MAX_REQUESTS > 0:
+        paths = probe_paths(result, PROBE_CANDIDATES, PROBE_MARGIN, PROBE_MAX_REQUESTS)
+        if paths and result.skipped_checks:
+            # Candidates are picked by score, so rank them on exact ones
+            result = await detect_cms_async(page_data, _detect_pool, True, previous=result)
+            paths = probe_paths(result, PROBE_CANDIDATES, PROBE_MARGIN, PROBE_MAX_REQUESTS)
+    if paths:
+        try:
+            async with _politeness.slot(clean_domain):
+                await probe_page(page_data, paths, client, PROBE_TIMEOUT)
+        except SlotUnavailable:
+            pass
+        else:
+            _probe_requests_total.inc(len(paths))
+            result = await detect_cms_async(
+                page_data, _detect_pool, DETECT_FULL_SCORES, margin, previous=result
+            )
+        probe_timings["probe"] = _ms_since(detected)
+    # Detection is final; only the headers and timings are read from here on.
+    page_data.release()
+
+    _detect_seconds.observe(sum(result.timings.values()) / 1000)
+    elapsed_ms = int((time.monotonic() - start) * 1000)
+    timings = {
+        "queue": _ms_since(start, queued),
+        **page_data.timings,
+        "fetch": _ms_since(queued, fetched),
+        **result.timings,
+        "detect": _ms_since(fetched, detected),
+        **probe_timings,
+    }
+
+    return 200, {
+        "domain": clean_domain,
+        "url_checked": page_data.url_final,
+        "cms": result.cms,
+        "confidence": result.confidence,
+        "signals": result.signals,
+        "version": result.version,
+        "scores": result.scores,
+        "technologies": result.technologies,
+        "elapsed_ms": elapsed_ms,
+        "timings": timings,
+    }
+
+
+def _ms_since(start: float, end: float | None = None) -> float:
+    """Milliseconds from ``start`` to ``end`` (default: now), monotonic clock."""
+    return round(((time.monotonic() if end is None else end) - start) * 1000, 2)
+
+
+def _server_timing(timings: dict[str, float], total_ms: float, cache_hit: bool) -> str:
+    """Server-Timing header value: one metric per stage, then the total."""
+    metrics = [f"{stage};dur={ms}" for stage, ms in timings.items()]
+    if cache_hit:
+        metrics.append('cache;desc="hit"')
+    metrics.append(f"total;dur={round(total_ms, 2)}")
+    return ", ".join(metrics)
+
+
+def _http_client(request: Request) -> httpx.AsyncClient | None:
+    """The app's shared client.
+
+    Runtimes that skip the lifespan have none; fetch_page then falls back
+    to a short-lived client.
+    """
+    return getattr(request.app.state, "http_client", None)
+
+
 @app.get("/api/detect")
 async def detect(
     request: Request,
     response: Response,
     domain: str = Query(..., description="Domain to check, e.g. example.com"),
+    timings: bool = Query(False, description="Include per-stage timings (ms) in the body"),
 ):
-    """Detect the CMS used by a given domain."""
+    """Detect the CMS used by a given domain.
+
+    Stage timings are always sent in the ``Server-Timing`` header.
+    """
+    start = time.monotonic()
     # Rate limit check
     client_ip = _get_client_ip(request)
-    is_limited, remaining = _check_rate_limit(client_ip)
+    is_limited, remaining, retry_after = await _check_rate_limit(client_ip)
 
     if is_limited and RATE_LIMIT_RPM > 0:
+        return _rate_limited_response(retry_after, start)
+
+    response.headers["X-RateLimit-Limit"] = str(RATE_LIMIT_RPM)
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
+
+    stages: dict[str, float] = {}
+    status_code, content, cache_hit = await _detect_domain(domain, _http_client(request), stages)
+    server_timing = _server_timing(stages, (time.monotonic() - start) * 1000, cache_hit)
+    if timings:
+        content["timings"] = stages
+    if status_code != 200:
+        return JSONResponse(
+            status_code=status_code,
+            content=content,
+            headers={"Server-Timing": server_timing},
+        )
+
+    response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+    response.headers["Server-Timing"] = server_timing
+
+    # Cache on Vercel CDN for 24 hours
+    response.headers["Cache-Control"] = "s-maxage=86400"
+
+    return content
+
+
+# --- Batch detection (configurable via environment variables) ---
+BATCH_MAX_DOMAINS = int(os.environ.get("BATCH_MAX_DOMAINS", "1000"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "20"))
+BATCH_PER_HOST = int(os.environ.get("BATCH_PER_HOST", "2"))
+# Caps on one stream request: domains listed, and body bytes read.
+STREAM_MAX_DOMAINS = int(os.environ.get("STREAM_MAX_DOMAINS", "100000"))
+STREAM_MAX_BODY_BYTES = int(os.environ.get("STREAM_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+
+
+class BatchRequest(BaseModel):
+    domains: list[str] = Field(..., min_length=1, description="Domains to check")
+
+
+@app.post("/api/detect/batch")
+async def detect_batch(request: Request, response: Response, body: BatchRequest):
+    """Detect the CMS for many domains with bounded concurrency.
+
+    Each domain counts as one request for rate limiting, and the batch
+    runs only if the client's remaining allowance covers all of them.
+    Each entry in ``results`` has the single-domain response body plus
+    its ``status``.
+    """
+    start = time.monotonic()
+    if len(body.domains) > BATCH_MAX_DOMAINS:
         return JSONResponse(
-            status_code=429,
+            status_code=422,
             content={
-                "error": "Rate limit exceeded",
-                "detail": f"Maximum {RATE_LIMIT_RPM} requests per minute",
-                "retry_after": 60,
-            },
-            headers={
-                "Retry-After": "60",
-                "X-RateLimit-Limit": str(RATE_LIMIT_RPM),
-                "X-RateLimit-Remaining": "0",
+                "error": "Batch too large",
+                "detail": f"Maximum {BATCH_MAX_DOMAINS} domains per batch",
             },
         )
 
+    too_many = _exceeds_rate_limit(len(body.domains))
+    if too_many is not None:
+        return too_many
+
+    client_ip = _get_client_ip(request)
+    is_limited, remaining, retry_after = await _check_rate_limit(client_ip, len(body.domains))
+
+    if is_limited and RATE_LIMIT_RPM > 0:
+        return _rate_limited_response(retry_after, start)
+
     response.headers["X-RateLimit-Limit"] = str(RATE_LIMIT_RPM)
     response.headers["X-RateLimit-Remaining"] = str(remaining)
 
-    start = time.monotonic()
+    for domain in body.domains:
+        _prefetch_dns(domain)
+    run = _batch_runner(_http_client(request))
+    results = await asyncio.gather(*(run(d) for d in body.domains))
+    return {"count": len(results), "results": results}
 
-    # Validate domain
-    try:
-        clean_domain = normalize_domain(domain)
-    except ValueError as e:
-        return JSONResponse(
-            status_code=422,
-            content={"error": f"Invalid domain: {domain}", "detail": str(e)},
-        )
 
-    # Fetch the page
+def _batch_runner(client: httpx.AsyncClient | None) -> Callable[[str], Awaitable[dict]]:
+    """Return a coroutine function that detects one domain of a batch.
+
+    Calls share a global limit of BATCH_CONCURRENCY and a per-domain limit
+    of BATCH_PER_HOST. Each result is the single-domain response body plus
+    its ``status``.
+    """
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    host_slots: dict[str, asyncio.Semaphore] = collections.defaultdict(
+        lambda: asyncio.Semaphore(BATCH_PER_HOST)
+    )
+
+    async def run(domain: str) -> dict:
+        try:
+            host = normalize_domain(domain)
+        except ValueError:
+            host = domain
+        # Take the host slot first so repeats of one host wait without
+        # holding a global slot other hosts could use.
+        async with host_slots[host], slots:
+            status_code, content, _ = await _detect_domain(domain, client)
+        return {"status": status_code, **content}
+
+    return run
+
+
+async def _iter_list(items: list[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
+async def _iter_detections(
+    domains: AsyncIterator[str], client: httpx.AsyncClient | None
+) -> AsyncIterator[dict]:
+    """Yield batch results in completion order.
+
+    At most BATCH_CONCURRENCY detections are in flight, so memory stays
+    bounded however many domains the input holds. DNS for the next
+    DNS_PREFETCH_AHEAD domains is resolved while earlier ones are fetched.
+    """
+    run = _batch_runner(client)
+    pending: set[asyncio.Task] = set()
+    upcoming: collections.deque[str] = collections.deque()
+
+    async def ready() -> AsyncIterator[str]:
+        async for domain in domains:
+            _prefetch_dns(domain)
+            upcoming.append(domain)
+            if len(upcoming) > DNS_PREFETCH_AHEAD:
+                yield upcoming.popleft()
+        while upcoming:
+            yield upcoming.popleft()
+
     try:
-        page_data = await fetch_page(clean_domain)
-    except httpx.TimeoutException:
-        elapsed_ms = int((time.monotonic() - start) * 1000)
+        async for domain in ready():
+            if len(pending) >= BATCH_CONCURRENCY:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.create_task(run(domain)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away mid-stream: drop the work nobody will read.
+        for task in pending:
+            task.cancel()
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes | None:
+    """The request body, or None once it runs past ``max_bytes``."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+
+@app.post("/api/detect/stream")
+async def detect_stream(request: Request):
+    """Stream detection results as NDJSON, one line per domain as it finishes.
+
+    Accepts ``{"domains": [...]}`` as JSON, or any other body as a plain-text
+    list with one domain per line (e.g. ``curl --data-binary @domains.txt``).
+    Each line has the single-domain response body plus its ``status``.
+    Each domain counts as one request for rate limiting, as in a batch;
+    bodies over STREAM_MAX_BODY_BYTES or lists over STREAM_MAX_DOMAINS are
+    rejected.
+    """
+    start = time.monotonic()
+    # The body is read up front: once the StreamingResponse starts, its
+    # disconnect listener owns receive() and would swallow body chunks.
+    raw = await _read_body(request, STREAM_MAX_BODY_BYTES)
+    if raw is None:
         return JSONResponse(
-            status_code=504,
+            status_code=413,
             content={
-                "error": f"Timeout fetching {clean_domain}",
-                "domain": clean_domain,
-                "elapsed_ms": elapsed_ms,
+                "error": "Request body too large",
+                "detail": f"Maximum {STREAM_MAX_BODY_BYTES} bytes per stream request",
             },
         )
-    except (httpx.ConnectError, httpx.RemoteProtocolError, OSError) as e:
-        elapsed_ms = int((time.monotonic() - start) * 1000)
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = BatchRequest.model_validate_json(raw)
+        except ValueError as e:
+            return JSONResponse(
+                status_code=422,
+                content={"error": "Invalid request body", "detail": str(e)},
+            )
+        domain_list = body.domains
+    else:
+        text = raw.decode("utf-8", errors="replace")
+        domain_list = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(domain_list) > STREAM_MAX_DOMAINS:
         return JSONResponse(
-            status_code=502,
+            status_code=422,
             content={
-                "error": f"Could not reach {clean_domain}",
-                "detail": str(e),
-                "domain": clean_domain,
-                "elapsed_ms": elapsed_ms,
+                "error": "Stream too large",
+                "detail": f"Maximum {STREAM_MAX_DOMAINS} domains per stream",
             },
         )
 
-    # Detect CMS
-    result = detect_cms(page_data)
-    elapsed_ms = int((time.monotonic() - start) * 1000)
+    too_many = _exceeds_rate_limit(len(domain_list))
+    if too_many is not None:
+        return too_many
 
-    # Cache on Vercel CDN for 24 hours
-    response.headers["Cache-Control"] = "s-maxage=86400"
+    client_ip = _get_client_ip(request)
+    is_limited, remaining, retry_after = await _check_rate_limit(client_ip, len(domain_list))
 
-    return {
-        "domain": clean_domain,
-        "url_checked": page_data["url_final"],
-        "cms": result["cms"],
-        "confidence": result["confidence"],
-        "signals": result["signals"],
-        "version": result["version"],
-        "elapsed_ms": elapsed_ms,
-    }
+    if is_limited and RATE_LIMIT_RPM > 0:
+        return _rate_limited_response(retry_after, start)
+
+    domains = _iter_list(domain_list)
 
+    async def lines() -> AsyncIterator[str]:
+        async for result in _iter_detections(domains, _http_client(request)):
+            yield json.dumps(result) + "\n"
 
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={
+            "X-RateLimit-Limit": str(RATE_LIMIT_RPM),
+            "X-RateLimit-Remaining": str(remaining),
+        },
+    )
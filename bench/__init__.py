@@ -0,0 +1,4 @@
+"""Benchmarks for the detection engine.
+
+Run ``python -m bench`` from the repository root; see ``bench/__main__.py``.
+"""
@@ -0,0 +1,318 @@
+"""Benchmark harness: ``python -m bench [options]`` from the repository root.
+
+Stages:
+    normalize_domain   domain normalization over a mix of raw inputs
+    generator          meta generator extraction from the HTML
+    detect_cms         full signature scoring of a fetched page
+    fetch_page         streamed fetch + decode from a local stub server
+    api                GET /api/detect end to end (cache off) against the stub
+
+Every stage but normalize_domain runs once per page size. Each row reports
+ops/sec, p50/p99 latency and the peak traced memory of one operation.
+``--json`` saves the rows; ``--compare`` prints the p50 change against a
+saved run, so a signature or engine change can be checked before deploy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, replace
+
+from bench.fixtures import SIZES, fixtures
+from bench.stub import LoopbackTransport, StubServer
+from detector import (
+    PageData,
+    create_client,
+    detect_cms,
+    extract_meta_generator,
+    fetch_page,
+    normalize_domain,
+)
+
+STAGES = ("normalize_domain", "generator", "detect_cms", "fetch_page", "api")
+
+_RAW_DOMAINS = [
+    "example.com",
+    "https://www.Example.co.uk/path?q=1",
+    "http://shop.example.com:8080/",
+    "sub.domain.example.org.",
+    "EXAMPLE.IO#top",
+    "not a domain",
+]
+
+
+@dataclass
+class Result:
+    name: str
+    runs: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    peak_kib: float
+
+
+def _summarize(name: str, timings_ns: list[int], peak_bytes: int) -> Result:
+    timings_ns.sort()
+    p99 = timings_ns[min(len(timings_ns) - 1, int(len(timings_ns) * 0.99))]
+    return Result(
+        name=name,
+        runs=len(timings_ns),
+        ops_per_sec=len(timings_ns) / (sum(timings_ns) / 1e9),
+        p50_ms=statistics.median(timings_ns) / 1e6,
+        p99_ms=p99 / 1e6,
+        peak_kib=peak_bytes / 1024,
+    )
+
+
+def measure(name: str, op: Callable[[int], object], min_time: float, min_runs: int) -> Result:
+    """Time ``op(i)`` repeatedly for ``min_time`` seconds (and ``min_runs`` runs).
+
+    Memory is traced over a separate short pass, so tracing does not skew
+    the timings.
+    """
+    op(0)  # warm up caches and lazy imports
+    timings: list[int] = []
+    deadline = time.perf_counter() + min_time
+    i = 0
+    while time.perf_counter() < deadline or i < min_runs:
+        start = time.perf_counter_ns()
+        op(i)
+        timings.append(time.perf_counter_ns() - start)
+        i += 1
+
+    tracemalloc.start()
+    peak = 0
+    for j in range(3):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        op(j)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return _summarize(name, timings, peak)
+
+
+async def measure_async(
+    name: str, op: Callable[[int], Awaitable[object]], min_time: float, min_runs: int
+) -> Result:
+    """``measure`` for coroutine operations, run sequentially on the current loop."""
+    await op(0)
+    timings: list[int] = []
+    deadline = time.perf_counter() + min_time
+    i = 0
+    while time.perf_counter() < deadline or i < min_runs:
+        start = time.perf_counter_ns()
+        await op(i)
+        timings.append(time.perf_counter_ns() - start)
+        i += 1
+
+    tracemalloc.start()
+    peak = 0
+    for j in range(3):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await op(j)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return _summarize(name, timings, peak)
+
+
+# ---------- Stages ----------
+
+
+def bench_normalize(min_time: float, min_runs: int) -> list[Result]:
+    def op(i: int) -> None:
+        try:
+            normalize_domain(_RAW_DOMAINS[i % len(_RAW_DOMAINS)])
+        except ValueError:
+            pass
+
+    return [measure("normalize_domain", op, min_time, min_runs)]
+
+
+def bench_generator(pages: dict[str, list[PageData]], min_time: float, min_runs: int) -> list[Result]:
+    results = []
+    for size, page_list in pages.items():
+        htmls = [p.html for p in page_list]
+        results.append(measure(
+            f"generator/{size}",
+            lambda i: extract_meta_generator(htmls[i % len(htmls)]),
+            min_time,
+            min_runs,
+        ))
+    return results
+
+
+def bench_detect(pages: dict[str, list[PageData]], min_time: float, min_runs: int) -> list[Result]:
+    results = []
+    for size, page_list in pages.items():
+        # The page caches its parsed generator, so each run gets a fresh copy.
+        results.append(measure(
+            f"detect_cms/{size}",
+            lambda i: detect_cms(replace(page_list[i % len(page_list)])),
+            min_time,
+            min_runs,
+        ))
+        results.append(measure(
+            f"detect_cms_full/{size}",
+            lambda i: detect_cms(replace(page_list[i % len(page_list)]), full=True),
+            min_time,
+            min_runs,
+        ))
+    return results
+
+
+async def bench_fetch(hosts: dict[str, list[str]], port: int, min_time: float, min_runs: int) -> list[Result]:
+    results = []
+    async with create_client() as client:
+        client._transport = LoopbackTransport(port)
+        for size, names in hosts.items():
+            results.append(await measure_async(
+                f"fetch_page/{size}",
+                lambda i: fetch_page(names[i % len(names)], client),
+                min_time,
+                min_runs,
+            ))
+    return results
+
+
+async def bench_api(hosts: dict[str, list[str]], port: int, min_time: float, min_runs: int) -> list[Result]:
+    # Every request must reach the stub: no cache, no rate limit. The stub
+    # hosts share one registrable domain, so politeness spacing would be
+    # measured instead of the detect path.
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+    os.environ["RATE_LIMIT_RPM"] = "0"
+    os.environ["POLITENESS_MIN_DELAY_MS"] = "0"
+    os.environ["POLITENESS_PER_DOMAIN"] = "0"
+    import httpx
+
+    from api.index import app
+
+    results = []
+    async with app.router.lifespan_context(app):
+        app.state.http_client._transport = LoopbackTransport(port)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as api:
+            for size, names in hosts.items():
+                async def op(i: int, names: list[str] = names) -> None:
+                    resp = await api.get("/api/detect", params={"domain": names[i % len(names)]})
+                    resp.raise_for_status()
+
+                results.append(await measure_async(f"api/{size}", op, min_time, min_runs))
+    return results
+
+
+async def _run_network_stages(
+    stages: list[str], pages: dict[str, list[PageData]], min_time: float, min_runs: int
+) -> list[Result]:
+    served: dict[str, PageData] = {}
+    hosts: dict[str, list[str]] = {}
+    for size, page_list in pages.items():
+        hosts[size] = []
+        for n, page in enumerate(page_list):
+            host = f"site{n}-{size}.bench.test"
+            served[host] = page
+            hosts[size].append(host)
+
+    results = []
+    async with StubServer(served) as server:
+        if "fetch_page" in stages:
+            results += await bench_fetch(hosts, server.port, min_time, min_runs)
+        if "api" in stages:
+            results += await bench_api(hosts, server.port, min_time, min_runs)
+    return results
+
+
+def _recorded_pages(path: str, limit: int) -> list[PageData]:
+    from corpus import read_records, record_page_data
+
+    pages = []
+    for record in read_records(path):
+        pages.append(record_page_data(record))
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+# ---------- Reporting ----------
+
+
+def _print_table(results: list[Result], baseline: dict[str, dict] | None) -> None:
+    header = f"{'benchmark':<24}{'runs':>8}{'ops/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}"
+    if baseline is not None:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (
+            f"{r.name:<24}{r.runs:>8}{r.ops_per_sec:>12.1f}"
+            f"{r.p50_ms:>10.3f}{r.p99_ms:>10.3f}{r.peak_kib:>10.1f}"
+        )
+        if baseline is not None:
+            base = baseline.get(r.name)
+            line += f"{(r.p50_ms / base['p50_ms'] - 1) * 100:>+12.1f}%" if base else f"{'-':>13}"
+        print(line)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench", description="Benchmark the CMS detection engine."
+    )
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="comma-separated page sizes")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument("--min-runs", type=int, default=10, help="minimum runs per benchmark")
+    parser.add_argument("--recorded", help="also run generator/detect_cms over a page corpus")
+    parser.add_argument("--recorded-limit", type=int, default=1000, help="pages to load from --recorded")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="show p50 change against results saved with --json")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(sorted(unknown))}")
+
+    pages: dict[str, list[PageData]] = {}
+    for fixture in fixtures(sizes):
+        pages.setdefault(fixture.size, []).append(fixture.page_data)
+    offline_pages = dict(pages)
+    if args.recorded:
+        offline_pages["recorded"] = _recorded_pages(args.recorded, args.recorded_limit)
+
+    results: list[Result] = []
+    if "normalize_domain" in stages:
+        results += bench_normalize(args.min_time, args.min_runs)
+    if "generator" in stages:
+        results += bench_generator(offline_pages, args.min_time, args.min_runs)
+    if "detect_cms" in stages:
+        results += bench_detect(offline_pages, args.min_time, args.min_runs)
+    if "fetch_page" in stages or "api" in stages:
+        results += asyncio.run(_run_network_stages(stages, pages, args.min_time, args.min_runs))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {row["name"]: row for row in json.load(f)}
+    _print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
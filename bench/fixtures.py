@@ -0,0 +1,192 @@
+"""Synthetic pages for benchmarks: one per CMS (and one with none) per size.
+
+Pages are built from what real sites of each CMS serve: response headers,
+Set-Cookie values, a meta generator and asset URLs in the head, and asset
+references repeated through ordinary body markup, padded to the target size.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+
+from detector import PageData
+
+# Target body sizes, in bytes of HTML.
+SIZES = {
+    "small": 30 * 1024,
+    "500k": 500 * 1024,
+    "2m": 2 * 1024 * 1024,
+}
+
+
+@dataclass
+class Profile:
+    """What a site built on one CMS typically sends."""
+
+    headers: dict[str, str] = field(default_factory=dict)
+    set_cookies: list[str] = field(default_factory=list)
+    generator: str | None = None
+    head: str = ""
+    # Inserted into body blocks, one per block, cycling.
+    body: list[str] = field(default_factory=list)
+
+
+PROFILES: dict[str | None, Profile] = {
+    "WordPress": Profile(
+        headers={"link": '<https://example.com/wp-json/>; rel="https://api.w.org/"'},
+        generator="WordPress 6.5.2",
+        head=(
+            '<link rel="stylesheet" href="/wp-content/themes/astra/style.css?ver=4.6">'
+            "<script>window._wpemojiSettings = {\"baseUrl\": \"https://s.w.org/\"};</script>"
+        ),
+        body=[
+            '<img src="/wp-content/uploads/2024/03/hero.jpg" alt="">',
+            '<script src="/wp-includes/js/wp-embed.min.js?ver=6.5.2"></script>',
+        ],
+    ),
+    "Shopify": Profile(
+        headers={"x-shopify-stage": "production", "x-sorting-hat-shopid": "shopify-5521"},
+        set_cookies=["_shopify_y=abc123; path=/; max-age=31536000"],
+        head=(
+            '<meta name="shopify-checkout-api-token" content="0f3a">'
+            "<script>Shopify.theme = {\"name\": \"Dawn\"};</script>"
+        ),
+        body=['<img src="https://cdn.shopify.com/s/files/1/0552/products/item.jpg">'],
+    ),
+    "Wix": Profile(
+        headers={"x-wix-request-id": "1711.22"},
+        generator="Wix.com Website Builder",
+        head='<script src="https://static.parastorage.com/services/wix-thunderbolt/app.js"></script>',
+        body=['<img src="https://static.wixstatic.com/media/a1b2.jpg">'],
+    ),
+    "Squarespace": Profile(
+        headers={"server": "Squarespace"},
+        head="<script>Static.SQUARESPACE_CONTEXT = {\"website\": {}};</script>",
+        body=['<div class="sqs-block html-block"><a href="https://www.squarespace.com">x</a></div>'],
+    ),
+    "Drupal": Profile(
+        headers={"x-drupal-cache": "HIT", "x-generator": "Drupal 10 (https://www.drupal.org)"},
+        generator="Drupal 10 (https://www.drupal.org)",
+        head='<script src="/core/misc/drupal.js?v=10.2.4"></script>',
+        body=['<img src="/sites/default/files/styles/large/public/photo.jpg">'],
+    ),
+    "Joomla": Profile(
+        generator="Joomla! 4.4 - Open Source Content Management",
+        head='<script src="/media/system/js/core.min.js?4.4"></script>',
+        body=['<a href="/index.php?option=com_content&view=article" class="/components/com_content">more</a>'],
+    ),
+    "Webflow": Profile(
+        generator="Webflow",
+        head='<link href="https://assets.website-files.com/5f/css/site.webflow.css" rel="stylesheet">',
+        body=['<div class="w-nav" data-wf-page="65a1" data-wf-site="65a0"></div>'],
+    ),
+    "Ghost": Profile(
+        headers={"x-ghost-cache-status": "HIT"},
+        generator="Ghost 5.82",
+        head='<script defer src="/ghost/api/content/portal.min.js"></script>',
+        body=['<div class="ghost-portal"><img src="/content/themes/casper/assets/a.png"></div>'],
+    ),
+    "HubSpot CMS": Profile(
+        headers={"x-powered-by": "HubSpot", "x-hs-hub-id": "4411"},
+        head='<script src="//js.hs-scripts.com/4411.js"></script>',
+        body=['<div id="hs-banner-cookie-consent"><a href="https://www.hubspot.com">x</a></div>'],
+    ),
+    "BigCommerce": Profile(
+        headers={"x-bc-store-version": "BigCommerce 7.1"},
+        head="<script>window.stencilBootstrap('home', {\"platform\": 'bigcommerce'});</script>",
+        body=['<img src="https://cdn11.bigcommerce.com/s-abc123/images/stencil/p.jpg"> stencil-utils'],
+    ),
+    "Magento": Profile(
+        set_cookies=["X-Magento-Vary=9bf9; path=/", "mage-cache-storage=%7B%7D; path=/"],
+        head='<script type="text/x-magento-init">{"*": {"Magento_Ui/js/core/app": {}}}</script>',
+        body=['<img src="/static/version1712/frontend/Magento/luma/en_US/images/logo.svg">'],
+    ),
+    "PrestaShop": Profile(
+        headers={"powered-by": "PrestaShop"},
+        set_cookies=["PrestaShop-a1b2=def; path=/; HttpOnly"],
+        generator="PrestaShop 1.7.8",
+        head='<script src="/themes/classic/assets/js/prestashop.js"></script>',
+        body=['<img src="/modules/ps_imageslider/images/slide.jpg">'],
+    ),
+    None: Profile(
+        headers={"server": "nginx", "x-powered-by": "Express"},
+        head='<script src="/static/js/main.4f2a.js"></script>',
+        body=['<img src="/static/media/logo.svg" alt="logo">'],
+    ),
+}
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua ut enim ad minim"
+).split()
+
+
+def _block(rng: random.Random, i: int, asset: str | None) -> str:
+    """One article-like chunk of body markup."""
+    words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120)))
+    links = "".join(
+        f'<li class="nav-item"><a href="/section/{i}/{j}">{rng.choice(_WORDS)}</a></li>'
+        for j in range(rng.randint(2, 6))
+    )
+    return (
+        f'<section class="block block-{i % 7}" id="s{i}"><ul class="nav">{links}</ul>'
+        f'<h2 class="title">{words[:40]}</h2><p class="text">{words}</p>'
+        f"{asset or ''}</section>\n"
+    )
+
+
+def build_page(cms: str | None, size: int, seed: int = 0) -> PageData:
+    """A page like fetch_page returns, with ``size`` bytes of HTML."""
+    profile = PROFILES[cms]
+    rng = random.Random(seed)
+    generator = (
+        f'<meta name="generator" content="{profile.generator}">' if profile.generator else ""
+    )
+    head = (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+        f"<title>{cms or 'Plain'} site</title>{generator}{profile.head}</head><body>\n"
+    )
+    parts = [head]
+    total = len(head)
+    i = 0
+    # Real pages reference their assets throughout, not just once.
+    while total < size:
+        asset = profile.body[i % len(profile.body)] if profile.body and i % 4 == 0 else None
+        block = _block(rng, i, asset)
+        parts.append(block)
+        total += len(block)
+        i += 1
+    parts.append("</body></html>")
+    html = "".join(parts)
+
+    cookies = {}
+    for raw in profile.set_cookies:
+        name, _, rest = raw.partition("=")
+        cookies[name] = rest.split(";", 1)[0]
+    return PageData(
+        url_final="https://example.com/",
+        status_code=200,
+        headers=dict(profile.headers),
+        cookies=cookies,
+        raw_set_cookies=list(profile.set_cookies),
+        html=html,
+    )
+
+
+@dataclass
+class Fixture:
+    name: str
+    cms: str | None
+    size: str
+    page_data: PageData
+
+
+def fixtures(sizes: list[str] | None = None) -> list[Fixture]:
+    """One fixture per CMS (plus none) for each size name in ``sizes``."""
+    out = []
+    for size in sizes or list(SIZES):
+        for cms in PROFILES:
+            name = f"{(cms or 'none').lower().replace(' ', '-')}-{size}"
+            out.append(Fixture(name, cms, size, build_page(cms, SIZES[size])))
+    return out
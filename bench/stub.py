@@ -0,0 +1,84 @@
+"""Local stub origin for benchmarking the full fetch-and-detect path.
+
+``StubServer`` answers HTTP/1.1 keep-alive requests on 127.0.0.1 with a
+canned page picked by Host header. ``LoopbackTransport`` sends every
+request a client makes, HTTP or HTTPS, to that server instead, so real
+domain names can be used without DNS or TLS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from detector import PageData
+
+
+class StubServer:
+    """Serves ``pages[host] = page`` (headers, Set-Cookies and HTML)."""
+
+    def __init__(self, pages: dict[str, PageData]) -> None:
+        self.pages = pages
+        self.port = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._responses: dict[str, bytes] = {}
+
+    async def __aenter__(self) -> StubServer:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _response(self, host: str) -> bytes:
+        cached = self._responses.get(host)
+        if cached is not None:
+            return cached
+        page = self.pages.get(host)
+        if page is None:
+            return b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n"
+        body = page.html.encode("utf-8")
+        lines = [
+            "HTTP/1.1 200 OK",
+            "Content-Type: text/html; charset=utf-8",
+            f"Content-Length: {len(body)}",
+        ]
+        lines += [f"{name}: {value}" for name, value in page.headers.items()]
+        lines += [f"Set-Cookie: {raw}" for raw in page.raw_set_cookies]
+        response = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        self._responses[host] = response
+        return response
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                host = ""
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    if name.lower() == "host":
+                        host = value.strip().split(":")[0]
+                writer.write(self._response(host))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class LoopbackTransport(httpx.AsyncBaseTransport):
+    """Rewrites every request to plain HTTP on the stub server's port."""
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self._inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
@@ -1,11 +1,12 @@
-"""CMS signature definitions with regex patterns and weighted scoring."""
+"""CMS and other technology signatures with regex patterns and weighted scoring."""
 
 from __future__ import annotations
 
+import hashlib
 import re
 
 # Each CMS has a list of checks. Each check is a dict:
-#   - type: "header", "cookie", "html", "meta_generator", "script", "meta"
+#   - type: "header", "cookie", "html", "meta_generator", "script", "meta", "probe"
 #   - pattern: compiled regex
 #   - weight: int (15-35)
 #   - description: human-readable label for signal reporting
@@ -16,6 +17,9 @@ import re
 # "meta_generator" checks <meta name="generator"> content attribute.
 # "script" checks <script> tag src attributes and inline content.
 # "meta" checks arbitrary <meta> tag attributes.
+# "probe" checks the body of a secondary request to ``path`` on the site
+#   (2xx responses only). Probes are only sent when the homepage leaves the
+#   result open, so their weight does not count toward a CMS's max score.
 
 CMS_SIGNATURES: dict[str, list[dict]] = {
     "WordPress": [
@@ -63,6 +67,20 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: wp-embed.min.js",
         },
+        {
+            "type": "probe",
+            "path": "/wp-json/",
+            "pattern": re.compile(r'"wp/v2"', re.IGNORECASE),
+            "weight": 30,
+            "description": "probe: /wp-json/ lists the wp/v2 REST namespace",
+        },
+        {
+            "type": "probe",
+            "path": "/readme.html",
+            "pattern": re.compile(r"<title>\s*WordPress", re.IGNORECASE),
+            "weight": 20,
+            "description": "probe: /readme.html WordPress readme",
+        },
     ],
     "Shopify": [
         {
@@ -103,6 +121,13 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: myshopify.com reference",
         },
+        {
+            "type": "probe",
+            "path": "/robots.txt",
+            "pattern": re.compile(r"we use Shopify as our ecommerce platform", re.IGNORECASE),
+            "weight": 30,
+            "description": "probe: /robots.txt generated by Shopify",
+        },
     ],
     "Wix": [
         {
@@ -210,6 +235,13 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 20,
             "description": "html: Drupal JS references",
         },
+        {
+            "type": "probe",
+            "path": "/robots.txt",
+            "pattern": re.compile(r"Disallow:\s*/(core|misc)/", re.IGNORECASE),
+            "weight": 20,
+            "description": "probe: /robots.txt disallows Drupal core paths",
+        },
     ],
     "Joomla": [
         {
@@ -243,6 +275,13 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: Joomla! reference",
         },
+        {
+            "type": "probe",
+            "path": "/administrator/manifests/files/joomla.xml",
+            "pattern": re.compile(r"files_joomla", re.IGNORECASE),
+            "weight": 35,
+            "description": "probe: Joomla core manifest",
+        },
     ],
     "Webflow": [
         {
@@ -308,6 +347,13 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: Ghost content/themes/ path",
         },
+        {
+            "type": "probe",
+            "path": "/ghost/api/admin/site/",
+            "pattern": re.compile(r'"site"\s*:\s*\{', re.IGNORECASE),
+            "weight": 30,
+            "description": "probe: /ghost/api/ site endpoint",
+        },
     ],
     "HubSpot CMS": [
         {
@@ -407,6 +453,13 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: Magento /static/version path",
         },
+        {
+            "type": "probe",
+            "path": "/magento_version",
+            "pattern": re.compile(r"^Magento/\d", re.IGNORECASE | re.MULTILINE),
+            "weight": 35,
+            "description": "probe: /magento_version",
+        },
     ],
     "PrestaShop": [
         {
@@ -440,10 +493,409 @@ CMS_SIGNATURES: dict[str, list[dict]] = {
             "weight": 15,
             "description": "html: PrestaShop JS files",
         },
+        {
+            "type": "probe",
+            "path": "/robots.txt",
+            "pattern": re.compile(r"generated by PrestaShop", re.IGNORECASE),
+            "weight": 30,
+            "description": "probe: /robots.txt generated by PrestaShop",
+        },
     ],
 }
 
-# Score threshold: a CMS must reach this score to be reported as detected.
+# Other technologies, by category, in the same check format. A page can
+# use several technologies of one category (say two analytics tools), so
+# every technology reaching DETECTION_THRESHOLD is reported, not only the
+# best. Probe checks are not supported here.
+TECH_SIGNATURES: dict[str, dict[str, list[dict]]] = {
+    "cdn": {
+        "Cloudflare": [
+            {
+                "type": "header",
+                "pattern": re.compile(r"cloudflare", re.IGNORECASE),
+                "header_name": "server",
+                "weight": 30,
+                "description": "header: Server: cloudflare",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"\S"),
+                "header_name": "cf-ray",
+                "weight": 30,
+                "description": "header: CF-Ray present",
+            },
+            {
+                "type": "cookie",
+                "pattern": re.compile(r"^__cf_bm$|^__cflb$|^cf_clearance$", re.IGNORECASE),
+                "weight": 20,
+                "description": "cookie: Cloudflare bot-management cookie",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"/cdn-cgi/", re.IGNORECASE),
+                "weight": 15,
+                "description": "html: /cdn-cgi/ path",
+            },
+        ],
+        "Fastly": [
+            {
+                "type": "header",
+                "pattern": re.compile(r"\S"),
+                "header_name": "x-fastly-request-id",
+                "weight": 30,
+                "description": "header: X-Fastly-Request-ID present",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"^cache-[a-z]+\d", re.IGNORECASE),
+                "header_name": "x-served-by",
+                "weight": 20,
+                "description": "header: X-Served-By names a Fastly cache node",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"fastly", re.IGNORECASE),
+                "header_name": "via",
+                "weight": 25,
+                "description": "header: Via: fastly",
+            },
+        ],
+        "Akamai": [
+            {
+                "type": "header",
+                "pattern": re.compile(r"AkamaiGHost|AkamaiNetStorage", re.IGNORECASE),
+                "header_name": "server",
+                "weight": 35,
+                "description": "header: Server: AkamaiGHost",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"\S"),
+                "header_name": "x-akamai-transformed",
+                "weight": 30,
+                "description": "header: X-Akamai-Transformed present",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"\S"),
+                "header_name": "akamai-grn",
+                "weight": 30,
+                "description": "header: Akamai-GRN present",
+            },
+        ],
+        "Amazon CloudFront": [
+            {
+                "type": "header",
+                "pattern": re.compile(r"\S"),
+                "header_name": "x-amz-cf-id",
+                "weight": 30,
+                "description": "header: X-Amz-Cf-Id present",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"cloudfront", re.IGNORECASE),
+                "header_name": "via",
+                "weight": 30,
+                "description": "header: Via: CloudFront",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"cloudfront", re.IGNORECASE),
+                "header_name": "x-cache",
+                "weight": 20,
+                "description": "header: X-Cache from cloudfront",
+            },
+        ],
+    },
+    "analytics": {
+        "Google Analytics": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"googletagmanager\.com/gtag/js", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: gtag.js",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"google-analytics\.com/(?:analytics|ga)\.js", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: analytics.js",
+            },
+        ],
+        "Google Tag Manager": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"googletagmanager\.com/gtm\.js", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: gtm.js",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"googletagmanager\.com/ns\.html", re.IGNORECASE),
+                "weight": 25,
+                "description": "html: GTM noscript iframe",
+            },
+        ],
+        "Matomo": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"/(?:matomo|piwik)\.js", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: matomo.js",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"_paq\.push", re.IGNORECASE),
+                "weight": 25,
+                "description": "script: _paq.push tracker queue",
+            },
+        ],
+        "Plausible": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"plausible\.io/js/", re.IGNORECASE),
+                "weight": 35,
+                "description": "script: plausible.io",
+            },
+        ],
+        "Hotjar": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"static\.hotjar\.com", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: static.hotjar.com",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"_hjSettings", re.IGNORECASE),
+                "weight": 25,
+                "description": "script: _hjSettings",
+            },
+        ],
+        "Meta Pixel": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"connect\.facebook\.net/[a-z_]+/fbevents\.js", re.IGNORECASE),
+                "weight": 35,
+                "description": "script: fbevents.js",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"fbq\(['\"]init", re.IGNORECASE),
+                "weight": 20,
+                "description": "script: fbq('init')",
+            },
+        ],
+        "Segment": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"cdn\.segment\.com/analytics\.js", re.IGNORECASE),
+                "weight": 35,
+                "description": "script: cdn.segment.com analytics.js",
+            },
+        ],
+    },
+    "ecommerce": {
+        "WooCommerce": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"/wp-content/plugins/woocommerce/", re.IGNORECASE),
+                "weight": 35,
+                "description": "html: WooCommerce plugin assets",
+            },
+            {
+                "type": "cookie",
+                "pattern": re.compile(r"woocommerce_|wp_woocommerce_session_", re.IGNORECASE),
+                "weight": 30,
+                "description": "cookie: woocommerce session",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"woocommerce-no-js|wc-ajax=", re.IGNORECASE),
+                "weight": 20,
+                "description": "html: WooCommerce markup",
+            },
+        ],
+        "Easy Digital Downloads": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"/wp-content/plugins/easy-digital-downloads/", re.IGNORECASE),
+                "weight": 35,
+                "description": "html: Easy Digital Downloads plugin assets",
+            },
+            {
+                "type": "cookie",
+                "pattern": re.compile(r"^edd_items_in_cart$", re.IGNORECASE),
+                "weight": 30,
+                "description": "cookie: edd_items_in_cart",
+            },
+        ],
+        "VirtueMart": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"com_virtuemart", re.IGNORECASE),
+                "weight": 35,
+                "description": "html: com_virtuemart component",
+            },
+        ],
+        "Drupal Commerce": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"/modules/(?:contrib/)?commerce/", re.IGNORECASE),
+                "weight": 35,
+                "description": "html: Drupal Commerce module assets",
+            },
+        ],
+        "Ecwid": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"app\.ecwid\.com/script\.js", re.IGNORECASE),
+                "weight": 35,
+                "description": "script: app.ecwid.com",
+            },
+        ],
+        "Snipcart": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"cdn\.snipcart\.com", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: cdn.snipcart.com",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"snipcart-add-item", re.IGNORECASE),
+                "weight": 20,
+                "description": "html: snipcart-add-item button",
+            },
+        ],
+    },
+    "js_framework": {
+        "React": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"data-reactroot", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: data-reactroot attribute",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"[/\"']react(?:-dom)?(?:\.[a-z]+)*\.js", re.IGNORECASE),
+                "weight": 25,
+                "description": "script: react.js bundle",
+            },
+        ],
+        "Next.js": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"__NEXT_DATA__", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: __NEXT_DATA__",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"/_next/static/", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: /_next/static/ assets",
+            },
+            {
+                "type": "header",
+                "pattern": re.compile(r"Next\.js", re.IGNORECASE),
+                "header_name": "x-powered-by",
+                "weight": 30,
+                "description": "header: X-Powered-By: Next.js",
+            },
+        ],
+        "Vue.js": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"data-v-[0-9a-f]{8}", re.IGNORECASE),
+                "weight": 25,
+                "description": "html: scoped data-v- attributes",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"[/\"']vue(?:\.[a-z]+)*\.js", re.IGNORECASE),
+                "weight": 25,
+                "description": "script: vue.js bundle",
+            },
+        ],
+        "Nuxt": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"window\.__NUXT__", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: window.__NUXT__",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"/_nuxt/", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: /_nuxt/ assets",
+            },
+        ],
+        "Angular": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"ng-version=", re.IGNORECASE),
+                "weight": 35,
+                "description": "html: ng-version attribute",
+            },
+        ],
+        "AngularJS": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"ng-app=", re.IGNORECASE),
+                "weight": 25,
+                "description": "html: ng-app attribute",
+            },
+            {
+                "type": "script",
+                "pattern": re.compile(r"[/\"']angular(?:\.min)?\.js", re.IGNORECASE),
+                "weight": 25,
+                "description": "script: angular.js",
+            },
+        ],
+        "Svelte": [
+            {
+                "type": "html",
+                "pattern": re.compile(r"__sveltekit", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: SvelteKit bootstrap",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"svelte-(?=[a-z]{0,5}[0-9])[a-z0-9]{6}", re.IGNORECASE),
+                "weight": 25,
+                "description": "html: svelte- hashed scope classes",
+            },
+        ],
+        "Gatsby": [
+            {
+                "type": "meta_generator",
+                "pattern": re.compile(r"Gatsby", re.IGNORECASE),
+                "weight": 35,
+                "description": "meta_generator: Gatsby",
+            },
+            {
+                "type": "html",
+                "pattern": re.compile(r"id=\"___gatsby\"", re.IGNORECASE),
+                "weight": 30,
+                "description": "html: ___gatsby root",
+            },
+        ],
+        "jQuery": [
+            {
+                "type": "script",
+                "pattern": re.compile(r"[/\"']jquery(?:-[0-9][0-9.]*)?(?:\.min)?\.js", re.IGNORECASE),
+                "weight": 30,
+                "description": "script: jquery.js",
+            },
+        ],
+    },
+}
+
+# Score threshold: a CMS (or other technology) must reach this score to be
+# reported as detected.
 DETECTION_THRESHOLD = 25
 
 # Version extraction patterns for meta generator tags.
@@ -454,3 +906,27 @@ VERSION_PATTERNS: dict[str, re.Pattern] = {
     "Ghost": re.compile(r"Ghost\s+([\d.]+)", re.IGNORECASE),
     "PrestaShop": re.compile(r"PrestaShop\s+([\d.]+)", re.IGNORECASE),
 }
+
+
+def _signatures_version() -> str:
+    """Short hash of every check (CMS and technology) and the threshold.
+
+    Persisted results tagged with a different version were produced by
+    other signatures and must not be served.
+    """
+    parts = [f"threshold={DETECTION_THRESHOLD}"]
+    named = [(cms_name, checks) for cms_name, checks in CMS_SIGNATURES.items()]
+    for category, technologies in TECH_SIGNATURES.items():
+        named.extend((f"{category}/{name}", checks) for name, checks in technologies.items())
+    for name, checks in named:
+        for check in checks:
+            parts.append(
+                f"{name}|{check['type']}|{check.get('header_name', '')}|{check.get('path', '')}|"
+                f"{check['pattern'].pattern}|{check['pattern'].flags}|{check['weight']}|"
+                f"{check['description']}"
+            )
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+# Identifies the current signature set (see _signatures_version).
+SIGNATURES_VERSION = _signatures_version()
@@ -0,0 +1,46 @@
+"""In-flight registry that coalesces concurrent work for the same key."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class RequestCoalescer:
+    """Run at most one task per key; concurrent callers await that task.
+
+    The work runs in its own task, so a caller that gives up (e.g. a client
+    disconnect) neither cancels it for the others nor loses its side
+    effects. Exceptions reach every waiter. The entry is removed as soon
+    as the task finishes, so the next call starts fresh work.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._tasks
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Return (result, shared); ``shared`` is True if another caller started it."""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Every waiter may have been cancelled; retrieve the exception so an
+        # error nobody awaited is not reported as "never retrieved".
+        if not task.cancelled():
+            task.exception()
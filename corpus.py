@@ -0,0 +1,255 @@
+"""Stored corpus of fetched pages, for re-running detection offline.
+
+A corpus is a JSONL file (gzip-compressed when the path ends in ``.gz``)
+with one record per page: the ``PageData`` fields ``fetch_page`` produced
+(headers, cookies, raw Set-Cookie values, capped HTML, final URL and status)
+plus the domain and capture time. Derived fields such as the meta generator
+are not stored; detection recomputes them.
+
+Usage:
+    python corpus.py capture domains.txt -o corpus.jsonl.gz
+    python corpus.py redetect corpus.jsonl.gz -o results.jsonl --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO
+
+import httpx
+
+from detector import PageData, create_client, detect_cms, fetch_page, normalize_domain
+from dns_cache import DNSCache
+from politeness import PolitenessScheduler
+
+# PageData fields kept in a record; everything detect_cms reads.
+RECORD_FIELDS = ("url_final", "status_code", "headers", "cookies", "raw_set_cookies", "html")
+
+
+# ---------- Records ----------
+
+
+def page_record(domain: str, page_data: PageData, captured_at: float | None = None) -> dict:
+    """Corpus record for one fetched page."""
+    record = {"domain": domain, "captured_at": captured_at or time.time()}
+    for field in RECORD_FIELDS:
+        record[field] = getattr(page_data, field)
+    return record
+
+
+def record_page_data(record: dict) -> PageData:
+    """Rebuild the ``PageData`` that ``detect_cms`` expects from a record."""
+    return PageData(**{field: record[field] for field in RECORD_FIELDS})
+
+
+def open_corpus(path: str, mode: str = "r") -> IO[str]:
+    """Open a corpus file for text I/O, gzip-compressed if it ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_records(path: str, records: Iterable[dict]) -> int:
+    """Write records to a corpus file; return how many were written."""
+    count = 0
+    with open_corpus(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """Yield the records of a corpus file."""
+    with open_corpus(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# ---------- Capture ----------
+
+
+async def capture(
+    domains: Iterable[str],
+    path: str,
+    concurrency: int = 20,
+    client: httpx.AsyncClient | None = None,
+    scheduler: PolitenessScheduler | None = None,
+) -> tuple[int, int]:
+    """Fetch each domain once and store its page; return (stored, failed).
+
+    Pages are read in full (up to the HTML cap), with no early stop, so
+    later signature changes see the same input a full fetch would.
+    Without ``client`` a pooled one is created for the run, resolving
+    through a DNS cache the default scheduler shares. Fetches go through
+    ``scheduler``; the default one waits out any backoff rather than
+    skipping the domain.
+    """
+    if client is None:
+        dns_cache = DNSCache()
+        if scheduler is None:
+            scheduler = PolitenessScheduler(
+                max_wait=300.0, backoff_max=300.0, resolve=dns_cache.first_address
+            )
+        async with create_client(dns_cache=dns_cache) as client:
+            return await capture(domains, path, concurrency, client, scheduler)
+    if scheduler is None:
+        scheduler = PolitenessScheduler(max_wait=300.0, backoff_max=300.0)
+
+    stored = failed = 0
+    # Bounded, so a huge domain list is read as fetches finish, not up front.
+    queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=concurrency)
+
+    async def fetch_one(domain: str) -> dict | None:
+        try:
+            async with scheduler.slot(domain):
+                page_data = await fetch_page(domain, client)
+                scheduler.report(domain, page_data.status_code, page_data.headers.get("retry-after"))
+        except Exception as exc:
+            print(f"{domain}: {type(exc).__name__}: {exc}", file=sys.stderr)
+            return None
+        record = page_record(domain, page_data)
+        page_data.release()
+        return record
+
+    async def worker(f: IO[str]) -> None:
+        nonlocal stored, failed
+        while (domain := await queue.get()) is not None:
+            record = await fetch_one(domain)
+            if record is None:
+                failed += 1
+                continue
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stored += 1
+
+    with open_corpus(path, "w") as f:
+        workers = [asyncio.ensure_future(worker(f)) for _ in range(concurrency)]
+        try:
+            for domain in _clean_domains(domains):
+                await queue.put(domain)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+    return stored, failed
+
+
+def _clean_domains(domains: Iterable[str]) -> Iterator[str]:
+    """Normalized, de-duplicated domains; invalid entries are reported and skipped."""
+    seen: set[str] = set()
+    for raw in domains:
+        if not raw.strip() or raw.lstrip().startswith("#"):
+            continue
+        try:
+            domain = normalize_domain(raw)
+        except ValueError as exc:
+            print(str(exc), file=sys.stderr)
+            continue
+        if domain not in seen:
+            seen.add(domain)
+            yield domain
+
+
+# ---------- Re-detection ----------
+
+
+def redetect_line(line: str) -> dict:
+    """Run detect_cms over one raw corpus line.
+
+    Workers receive raw lines so JSON decoding happens in parallel too.
+    """
+    record = json.loads(line)
+    result = detect_cms(record_page_data(record), full=True)
+    return {"domain": record["domain"], "status_code": record["status_code"], **result.as_dict()}
+
+
+def redetect_chunk(lines: list[str]) -> list[dict]:
+    """``redetect_line`` over a chunk of lines, one pool task per chunk."""
+    return [redetect_line(line) for line in lines]
+
+
+def redetect(path: str, workers: int | None = None, chunksize: int = 64) -> Iterator[dict]:
+    """Yield detection results for every record in a corpus, in file order.
+
+    ``workers=1`` runs in this process; otherwise a process pool of
+    ``workers`` (default: CPU count) shares the work. The file is read
+    only as results drain: at most two chunks per worker are in flight,
+    so memory does not grow with the corpus.
+    """
+    with open_corpus(path) as f:
+        lines = (line for line in f if line.strip())
+        if workers == 1:
+            yield from map(redetect_line, lines)
+            return
+        workers = workers or os.cpu_count() or 1
+        chunks = iter(lambda: list(itertools.islice(lines, chunksize)), [])
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = collections.deque(
+                pool.submit(redetect_chunk, chunk) for chunk in itertools.islice(chunks, 2 * workers)
+            )
+            while pending:
+                results = pending.popleft().result()
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(pool.submit(redetect_chunk, chunk))
+                yield from results
+
+
+# ---------- CLI ----------
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cap = sub.add_parser("capture", help="fetch domains and store their pages")
+    cap.add_argument("domains", help="file with one domain per line ('-' for stdin)")
+    cap.add_argument("-o", "--output", required=True, help="corpus path (.jsonl or .jsonl.gz)")
+    cap.add_argument("--concurrency", type=int, default=20)
+
+    red = sub.add_parser("redetect", help="re-run detection over a stored corpus")
+    red.add_argument("corpus", help="corpus path (.jsonl or .jsonl.gz)")
+    red.add_argument("-o", "--output", help="write results as JSONL here (default: stdout)")
+    red.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "capture":
+        source = sys.stdin if args.domains == "-" else open(args.domains, encoding="utf-8")
+        with source:
+            stored, failed = asyncio.run(capture(source, args.output, args.concurrency))
+        print(f"stored {stored} pages, {failed} failed", file=sys.stderr)
+        return 0
+
+    started = time.perf_counter()
+    counts: collections.Counter[str | None] = collections.Counter()
+    out = open_corpus(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in redetect(args.corpus, args.workers):
+            counts[result["cms"]] += 1
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"{total} pages in {elapsed:.1f}s", file=sys.stderr)
+    for cms, count in counts.most_common():
+        print(f"  {cms or '(none)'}: {count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
+import codecs
+import multiprocessing
 import re
+import time
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from urllib.parse import urlparse
 
 import httpx
-from bs4 import BeautifulSoup
+import numpy as np
 
-from cms_signatures import CMS_SIGNATURES, DETECTION_THRESHOLD, VERSION_PATTERNS
+from cms_signatures import DETECTION_THRESHOLD, VERSION_PATTERNS
+from dns_cache import CachingNetworkBackend, DNSCache
+from signature_index import SIGNATURE_INDEX
 
 # ---------- Domain normalization ----------
 
@@ -45,185 +57,829 @@ _USER_AGENT = (
 
 _MAX_HTML_BYTES = 2 * 1024 * 1024  # 2 MB
 
+_TIMEOUT = httpx.Timeout(8.0, connect=5.0)
 
-async def fetch_page(domain: str) -> dict:
+
+def create_client(
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    http2: bool = False,
+    dns_cache: DNSCache | None = None,
+) -> httpx.AsyncClient:
+    """Build a pooled client for page fetches, meant to be shared app-wide.
+
+    Set ``max_keepalive_connections`` to 0 to disable keep-alive. HTTP/2
+    needs the optional ``h2`` package (``httpx[http2]``); without it the
+    client silently stays on HTTP/1.1. With ``dns_cache``, connections
+    resolve hostnames through it instead of a blocking lookup per connect.
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            http2 = False
+    # Every fetch must see the site as a first-time visitor, so the shared
+    # client never stores cookies; ``_stream`` gives each fetch its own jar
+    # for the redirect chain. resp.cookies is still filled per response.
+    no_cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    transport = None
+    if dns_cache is not None:
+        transport = httpx.AsyncHTTPTransport(verify=False, http2=http2, limits=limits)
+        # httpx has no public hook for the network backend; the pool reads
+        # it each time it opens a connection.
+        transport._pool._network_backend = CachingNetworkBackend(dns_cache)
+    return httpx.AsyncClient(
+        timeout=_TIMEOUT,
+        follow_redirects=True,
+        max_redirects=5,
+        verify=False,
+        cookies=no_cookies,
+        http2=http2,
+        limits=limits,
+        transport=transport,
+    )
+
+
+@asynccontextmanager
+async def _stream(
+    client: httpx.AsyncClient, url: str, headers: dict[str, str], extensions: dict | None = None
+) -> AsyncIterator[httpx.Response]:
+    """Like ``client.stream("GET", ...)``, with cookies kept per fetch.
+
+    Redirects are followed here, up to the client's ``max_redirects``.
+    Cookies set along the chain are sent on the later hops, as a fresh
+    client would (consent and bot gates rely on it), but never reach the
+    shared client's jar.
+    """
+    cookies = httpx.Cookies()
+    request = client.build_request("GET", url, headers=headers, extensions=extensions)
+    for _ in range(client.max_redirects + 1):
+        resp = await client.send(request, stream=True, follow_redirects=False)
+        if resp.next_request is None:
+            break
+        await resp.aclose()
+        cookies.extract_cookies(resp)
+        request = resp.next_request
+        cookies.set_cookie_header(request)
+    else:
+        raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.", request=request)
+    try:
+        yield resp
+    finally:
+        await resp.aclose()
+
+
+# Errors after which an HTTPS attempt falls back to plain HTTP.
+_FALLBACK_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+# httpcore trace events that show a request reached the server: a fresh TCP
+# connection, or request headers going out on a pooled one.
+_CONNECTED_EVENTS = frozenset({
+    "connection.connect_tcp.complete",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+})
+
+# httpcore trace event prefixes timed as fetch stages. DNS resolution
+# happens inside connect_tcp, so it is part of "connect".
+_TRACE_STAGES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.receive_response_headers": "wait",
+    "http2.receive_response_headers": "wait",
+}
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+class FetchTimer:
+    """Per-stage durations of one fetch, fed from httpcore trace events.
+
+    Durations add up across redirects. ``stages`` maps stage name to
+    milliseconds and only holds stages that actually ran (a pooled
+    connection has no connect or tls).
+    """
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        self._started: dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = round(self.stages.get(stage, 0.0) + seconds * 1000, 2)
+
+    def trace(self, event_name: str) -> None:
+        prefix, _, phase = event_name.rpartition(".")
+        stage = _TRACE_STAGES.get(prefix)
+        if stage is None:
+            return
+        now = time.perf_counter()
+        if phase == "started":
+            self._started[stage] = now
+        else:
+            started = self._started.pop(stage, None)
+            if started is not None:
+                self.add(stage, now - started)
+
+
+async def fetch_page(
+    domain: str,
+    client: httpx.AsyncClient | None = None,
+    certainty_margin: int | None = None,
+    happy_eyeballs_delay: float | None = None,
+) -> PageData:
     """Fetch a domain's homepage. Try HTTPS first, fall back to HTTP.
 
-    Returns dict with keys:
-        headers, cookies, html, soup, url_final, status_code
+    Pass the app's shared ``client`` to reuse pooled connections; without
+    one a short-lived client is created for this call.
+
+    The body is streamed and reading stops at ``_MAX_HTML_BYTES`` bytes;
+    only the kept bytes are decoded, once, with the charset from the
+    Content-Type header, a byte order mark or a <meta> tag. With a
+    ``certainty_margin``, reading also stops as soon as the leading CMS is
+    ahead of the runner-up by at least that many points (see
+    ``StreamingDetector``), so the HTML may be a prefix of the page.
+
+    With ``happy_eyeballs_delay`` (seconds), HTTP is not held back until
+    HTTPS fails: if HTTPS has not connected within the delay, an HTTP
+    attempt starts alongside it, the first successful response wins and
+    the other attempt is cancelled.
+
+    Returns a ``PageData``. The meta generator is not parsed here;
+    detection extracts it on first use, so that work happens wherever
+    ``detect_cms`` runs.
     """
-    timeout = httpx.Timeout(8.0, connect=5.0)
-    headers = {"User-Agent": _USER_AGENT, "Accept": "text/html,*/*"}
+    if client is None:
+        async with create_client() as own_client:
+            return await fetch_page(
+                domain, own_client, certainty_margin, happy_eyeballs_delay
+            )
+
+    if happy_eyeballs_delay is not None:
+        return await _race_schemes(domain, client, certainty_margin, happy_eyeballs_delay)
 
     for scheme in ("https", "http"):
         url = f"{scheme}://{domain}"
         try:
-            async with httpx.AsyncClient(
-                timeout=timeout,
-                follow_redirects=True,
-                max_redirects=5,
-                verify=False,
-            ) as client:
-                resp = await client.get(url, headers=headers)
-
-                html = resp.text[:_MAX_HTML_BYTES] if resp.text else ""
-                soup = BeautifulSoup(html, "html.parser") if html else None
-
-                # Collect cookies as a simple dict of name->value
-                cookie_dict: dict[str, str] = {}
-                for name, value in resp.cookies.items():
-                    cookie_dict[name] = value
-                # Also pull set-cookie header raw values for pattern matching
-                raw_set_cookies = resp.headers.get_list("set-cookie")
-
-                return {
-                    "headers": dict(resp.headers),
-                    "cookies": cookie_dict,
-                    "raw_set_cookies": raw_set_cookies,
-                    "html": html,
-                    "soup": soup,
-                    "url_final": str(resp.url),
-                    "status_code": resp.status_code,
-                }
-        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError):
+            return await _fetch_url(client, url, certainty_margin)
+        except _FALLBACK_ERRORS:
             if scheme == "https":
                 continue  # fall back to HTTP
             raise
-        except httpx.TimeoutException:
-            raise
 
     # Should not reach here, but just in case
     raise httpx.ConnectError(f"Could not connect to {domain}")
 
 
+async def _race_schemes(
+    domain: str,
+    client: httpx.AsyncClient,
+    certainty_margin: int | None,
+    delay: float,
+) -> PageData:
+    """Happy-eyeballs fetch: give HTTPS a head start of ``delay`` seconds.
+
+    Attempts still running when this returns, fails or is cancelled are
+    cancelled.
+    """
+    connected = asyncio.Event()
+    https = asyncio.create_task(
+        _fetch_url(client, f"https://{domain}", certainty_margin, connected)
+    )
+    http: asyncio.Task | None = None
+    try:
+        connected_wait = asyncio.create_task(connected.wait())
+        try:
+            await asyncio.wait(
+                {https, connected_wait}, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            connected_wait.cancel()
+
+        if https.done() or connected.is_set():
+            # HTTPS reached the server (or already failed): plain fallback order.
+            try:
+                return await https
+            except _FALLBACK_ERRORS:
+                return await _fetch_url(client, f"http://{domain}", certainty_margin)
+
+        http = asyncio.create_task(_fetch_url(client, f"http://{domain}", certainty_margin))
+        pending = {https, http}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+
+        # Both failed. Like the sequential path, an HTTPS error that would not
+        # have triggered the fallback (e.g. a read timeout) takes precedence.
+        https_error = https.exception()
+        if not isinstance(https_error, _FALLBACK_ERRORS):
+            raise https_error
+        raise http.exception()
+    finally:
+        for task in (https, http):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def _fetch_url(
+    client: httpx.AsyncClient,
+    url: str,
+    certainty_margin: int | None,
+    connected: asyncio.Event | None = None,
+) -> PageData:
+    """Stream one URL into a ``PageData`` (see ``fetch_page``).
+
+    ``connected`` is set once the request reaches the server.
+    """
+    headers = {"User-Agent": _USER_AGENT, "Accept": "text/html,*/*"}
+    timer = FetchTimer()
+
+    async def trace(event_name: str, info: dict) -> None:
+        timer.trace(event_name)
+        if connected is not None and event_name in _CONNECTED_EVENTS:
+            connected.set()
+
+    extensions = {"trace": trace}
+    async with _stream(client, url, headers, extensions) as resp:
+        download_started = time.perf_counter()
+        # Collect cookies as a simple dict of name->value
+        cookie_dict: dict[str, str] = {}
+        for name, value in resp.cookies.items():
+            cookie_dict[name] = value
+        # Also pull set-cookie header raw values for pattern matching
+        raw_set_cookies = resp.headers.get_list("set-cookie")
+
+        page_data = PageData(
+            url_final=str(resp.url),
+            status_code=resp.status_code,
+            headers=dict(resp.headers),
+            cookies=cookie_dict,
+            raw_set_cookies=raw_set_cookies,
+            timings=timer.stages,
+        )
+
+        declared = resp.charset_encoding
+        early = StreamingDetector(page_data, declared) if certainty_margin is not None else None
+        # Raw bytes up to the cap; only the kept prefix is ever decoded.
+        body = bytearray()
+        async for chunk in resp.aiter_bytes():
+            body += chunk
+            if len(body) >= _MAX_HTML_BYTES:
+                break
+            if early is not None:
+                early.feed(chunk)
+                if early.is_conclusive(certainty_margin):
+                    break
+        timer.add("download", time.perf_counter() - download_started)
+        page_data.bytes_downloaded = resp.num_bytes_downloaded
+
+    del body[_MAX_HTML_BYTES:]
+    page_data.html = decode_body(body, declared)
+    return page_data
+
+
+# ---------- Body decoding ----------
+
+# <meta charset=...> or <meta http-equiv="Content-Type" content="...; charset=...">
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([a-z0-9_.:-]+)", re.IGNORECASE)
+
+# How far into the body a <meta> charset declaration is looked for.
+_CHARSET_SNIFF_BYTES = 1024
+
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+
+# Codecs in which every ASCII byte stands for that ASCII character, so
+# byte-level signature scans see the same text the decoded page holds.
+_ASCII_COMPATIBLE_RE = re.compile(r"utf-8(-sig)?|ascii|iso8859-\d+|cp125\d|koi8-[ru]|mac-roman")
+
+
+def _codec(name: str | None) -> str | None:
+    """Python's canonical name for a charset label, or None if unknown."""
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+
+
+def body_encoding(head: bytes, declared: str | None = None) -> str:
+    """Codec for a body from its leading bytes and the Content-Type charset.
+
+    A byte order mark wins, then the declared charset, then a <meta>
+    charset in the first 1 KB, then UTF-8.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    encoding = _codec(declared)
+    if encoding is not None:
+        return encoding
+    m = _META_CHARSET_RE.search(head, 0, _CHARSET_SNIFF_BYTES)
+    if m is not None:
+        encoding = _codec(m.group(1).decode("ascii"))
+        # A page that says so in ASCII markup cannot really be UTF-16/32.
+        if encoding is not None and not encoding.startswith(("utf-16", "utf-32")):
+            return encoding
+    return "utf-8"
+
+
+def decode_body(body: bytes, declared: str | None = None) -> str:
+    """Decode a (possibly truncated) body once, invalid bytes replaced."""
+    return body.decode(body_encoding(body, declared), errors="replace")
+
+
+# ---------- Meta generator extraction ----------
+
+_GENERATOR_NAME_RE = re.compile(r"generator", re.IGNORECASE)
+
+
+class _StopParsing(Exception):
+    """Raised from parser callbacks to abandon the rest of the document."""
+
+
+class _GeneratorParser(HTMLParser):
+    """Finds the first <meta name="generator"> and gives up after the head."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.content: str | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "meta":
+            attr_map = dict(attrs)
+            name = attr_map.get("name")
+            if name and _GENERATOR_NAME_RE.search(name):
+                self.content = attr_map.get("content") or ""
+                raise _StopParsing
+        elif tag == "body":
+            raise _StopParsing
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "head":
+            raise _StopParsing
+
+
+def extract_meta_generator(html: str) -> str | None:
+    """Return the content of the page's <meta name="generator"> tag.
+
+    Only the document head is parsed: parsing stops at the first generator
+    tag, at </head> or at <body>. Returns None when there is no tag.
+    """
+    if not html:
+        return None
+    parser = _GeneratorParser()
+    try:
+        parser.feed(html)
+    except _StopParsing:
+        pass
+    return parser.content
+
+
+# ---------- Page and result types ----------
+
+@dataclass(slots=True)
+class PageData:
+    """One fetched page, as ``fetch_page`` returns it and ``detect_cms`` reads it.
+
+    ``headers`` has lowercased names (as httpx gives them), ``cookies``
+    maps cookie name to value and ``raw_set_cookies`` keeps the raw
+    Set-Cookie values. ``bytes_downloaded`` counts body bytes read off the
+    wire and ``timings`` holds ms per fetch stage (connect, tls, wait,
+    download). ``probes`` maps secondary paths fetched by ``probe_page``
+    to (status, body prefix). ``generator``, ``cookie_names`` and ``soup``
+    are derived on first use and kept.
+    """
+
+    url_final: str = ""
+    status_code: int = 0
+    headers: dict[str, str] = field(default_factory=dict)
+    cookies: dict[str, str] = field(default_factory=dict)
+    raw_set_cookies: list[str] = field(default_factory=list)
+    html: str = ""
+    bytes_downloaded: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+    probes: dict[str, tuple[int, str]] = field(default_factory=dict)
+    _generator: str | None = field(default=None, init=False, repr=False, compare=False)
+    _generator_parsed: bool = field(default=False, init=False, repr=False, compare=False)
+    _cookie_names: frozenset[str] | None = field(default=None, init=False, repr=False, compare=False)
+    _soup: object = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def generator(self) -> str | None:
+        """Content of the <meta name="generator"> tag, parsed on first use."""
+        if not self._generator_parsed:
+            self._generator = extract_meta_generator(self.html)
+            self._generator_parsed = True
+        return self._generator
+
+    @property
+    def cookie_names(self) -> frozenset[str]:
+        """Names in ``cookies``, collected on first use."""
+        if self._cookie_names is None:
+            self._cookie_names = frozenset(self.cookies)
+        return self._cookie_names
+
+    @property
+    def soup(self):
+        """BeautifulSoup tree of the HTML, built on first use.
+
+        Detection never needs the full tree; this is for callers that do.
+        BeautifulSoup is imported on first use so it stays optional.
+        """
+        if self._soup is None and self.html:
+            from bs4 import BeautifulSoup
+
+            self._soup = BeautifulSoup(self.html, "html.parser")
+        return self._soup
+
+    def release(self) -> None:
+        """Drop the HTML and soup of a page kept around after detection.
+
+        Derived fields already computed (e.g. ``generator``) stay.
+        """
+        self.html = ""
+        self._soup = None
+
+
+@dataclass(slots=True)
+class DetectionResult:
+    """What ``detect_cms`` found on one page.
+
+    ``scores`` lists every CMS as {cms, score, confidence}, best first.
+    ``technologies`` maps each other category (cdn, analytics, ...) to its
+    detected technologies as {name, confidence, signals}, best first.
+    ``timings`` holds ms spent parsing (meta generator), matching and
+    scoring. ``matched_checks`` are the signature check IDs the page
+    satisfied, so a later pass with probes need not rescan the page.
+    ``skipped_checks`` are the HTML checks left unevaluated because their
+    CMS could no longer win (or technology no longer reach the threshold);
+    the scores of those CMSes are lower bounds.
+    """
+
+    cms: str | None = None
+    confidence: int = 0
+    signals: list[str] = field(default_factory=list)
+    version: str | None = None
+    scores: list[dict] = field(default_factory=list)
+    technologies: dict[str, list[dict]] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    matched_checks: frozenset[int] = field(default=frozenset(), repr=False, compare=False)
+    skipped_checks: frozenset[int] = field(default=frozenset(), repr=False, compare=False)
+
+    def as_dict(self) -> dict:
+        return {
+            "cms": self.cms,
+            "confidence": self.confidence,
+            "signals": self.signals,
+            "version": self.version,
+            "scores": self.scores,
+            "technologies": self.technologies,
+            "timings": self.timings,
+        }
+
+
 # ---------- CMS detection ----------
 
 
-def _check_header(check: dict, page_data: dict) -> bool:
-    """Check if a header matches the pattern."""
-    header_name = check.get("header_name", "").lower()
-    headers = page_data["headers"]
-    # httpx headers are case-insensitive in the mapping
-    value = headers.get(header_name, "")
-    if value and check["pattern"].search(value):
-        return True
-    return False
-
-
-def _check_cookie(check: dict, page_data: dict) -> bool:
-    """Check cookie names and values against pattern."""
-    pattern = check["pattern"]
-    # Check cookie names
-    for name in page_data["cookies"]:
-        if pattern.search(name):
-            return True
-    # Check raw set-cookie headers for more coverage
-    for raw in page_data.get("raw_set_cookies", []):
-        if pattern.search(raw):
-            return True
-    return False
-
-
-def _check_html(check: dict, page_data: dict) -> bool:
-    """Check raw HTML body against pattern."""
-    html = page_data.get("html", "")
-    return bool(html and check["pattern"].search(html))
-
-
-def _check_meta_generator(check: dict, page_data: dict) -> bool:
-    """Check <meta name='generator'> content."""
-    soup = page_data.get("soup")
-    if not soup:
-        return False
-    gen_tag = soup.find("meta", attrs={"name": re.compile(r"generator", re.IGNORECASE)})
-    if gen_tag:
-        content = gen_tag.get("content", "")
-        if content and check["pattern"].search(content):
-            return True
-    return False
-
-
-_CHECK_DISPATCH = {
-    "header": _check_header,
-    "cookie": _check_cookie,
-    "html": _check_html,
-    "meta_generator": _check_meta_generator,
-    "script": _check_html,  # scripts are in HTML body
-    "meta": _check_html,    # meta tags are in HTML body
-}
+def _match_checks(
+    page_data: PageData, full: bool = True, margin: int = 0
+) -> tuple[set[int], frozenset[int]]:
+    """IDs of the signature checks the page satisfies, and of those skipped.
 
+    Header, cookie, generator and probe checks are cheap and always run.
+    Unless ``full``, the HTML scan then only looks for checks of CMSes
+    those results leave in contention (see ``SignatureIndex.contended``).
+    """
+    index = SIGNATURE_INDEX
+    matched = index.match_headers(page_data.headers)
+    matched |= index.match_cookies(page_data.cookie_names, page_data.raw_set_cookies)
+    matched |= index.match_generator(page_data.generator)
+    matched |= index.match_probes(page_data.probes)
+    return _match_html(page_data, matched, index.html_check_ids, full, margin)
+
+
+def _match_html(
+    page_data: PageData, matched: set[int], pending: frozenset[int], full: bool, margin: int
+) -> tuple[set[int], frozenset[int]]:
+    """Add the ``pending`` HTML checks that still matter and match to ``matched``."""
+    index = SIGNATURE_INDEX
+    if full:
+        only = pending
+    else:
+        only = index.contended(matched, pending, DETECTION_THRESHOLD, margin)
+    if only:
+        matched |= index.match_html(page_data.html, only=only)
+    return matched, pending - only
+
+
+# ---------- Incremental detection ----------
+
+# Chunks are scanned with this many trailing bytes (or characters) of the
+# previous chunk prepended, so a signature split across two chunks is still found.
+# It must be at least as long as the longest text an HTML check can match.
+_STREAM_OVERLAP = 256
+
+
+class StreamingDetector:
+    """Running per-CMS scores for a page whose body is still arriving.
+
+    Header and cookie checks are scored up front from ``page_data``; each
+    raw body chunk passed to ``feed`` is scanned for HTML checks. In an
+    ASCII-compatible encoding chunks are scanned as bytes, without
+    decoding, for the pure-ASCII checks; otherwise they are decoded
+    incrementally and scanned as text. Meta generator checks, and anything
+    the byte scan cannot see, are left to the final ``detect_cms`` pass
+    over the full page.
+    """
 
-def _extract_version(cms_name: str, page_data: dict) -> str | None:
+    def __init__(self, page_data: PageData, encoding: str | None = None) -> None:
+        index = SIGNATURE_INDEX
+        self.scores: list[int] = [0] * len(index.names)
+        self._matched: set[int] = set()
+        self._declared = encoding
+        self._decoder = None
+        self._tail: str | bytes | None = None
+        matched = index.match_headers(page_data.headers)
+        matched |= index.match_cookies(page_data.cookie_names, page_data.raw_set_cookies)
+        for check_id in matched:
+            self._add(check_id)
+
+    def _add(self, check_id: int) -> None:
+        index = SIGNATURE_INDEX
+        self._matched.add(check_id)
+        self.scores[index.check_row[check_id]] += index.weights[check_id]
+
+    def _start(self, first_chunk: bytes) -> None:
+        encoding = body_encoding(first_chunk, self._declared)
+        if _ASCII_COMPATIBLE_RE.fullmatch(encoding):
+            self._tail = b""
+        else:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            self._tail = ""
+
+    def feed(self, chunk: bytes) -> None:
+        """Score the HTML checks found in the next raw body chunk."""
+        if self._tail is None:
+            self._start(chunk)
+        if self._decoder is None:
+            window = self._tail + chunk
+            found = SIGNATURE_INDEX.match_html_bytes(window, skip=self._matched)
+        else:
+            window = self._tail + self._decoder.decode(chunk)
+            found = SIGNATURE_INDEX.match_html(window, skip=self._matched)
+        for check_id in found:
+            self._add(check_id)
+        self._tail = window[-_STREAM_OVERLAP:]
+
+    def is_conclusive(self, margin: int) -> bool:
+        """True once the leading CMS passes the threshold and leads by ``margin``."""
+        cms_scores = self.scores[: SIGNATURE_INDEX.n_cms]
+        leader, runner_up = (sorted(cms_scores, reverse=True) + [0, 0])[:2]
+        return leader >= DETECTION_THRESHOLD and leader - runner_up >= margin
+
+
+def _signals(row_id: int, matched: frozenset[int], page_data: PageData) -> list[str]:
+    """Descriptions of the matched checks of one CMS or technology, in signature order."""
+    index = SIGNATURE_INDEX
+    signals = []
+    for check_id in index.row_check_ids[row_id]:
+        if check_id in matched:
+            check = index.checks[check_id]
+            # Enrich the signal description with actual matched value where useful
+            if check["type"] == "meta_generator":
+                signals.append(f"meta_generator: {page_data.generator}")
+            else:
+                signals.append(check["description"])
+    return signals
+
+
+def _extract_version(cms_name: str, page_data: PageData) -> str | None:
     """Try to extract CMS version from meta generator tag."""
     vp = VERSION_PATTERNS.get(cms_name)
     if not vp:
         return None
-    soup = page_data.get("soup")
-    if not soup:
-        return None
-    gen_tag = soup.find("meta", attrs={"name": re.compile(r"generator", re.IGNORECASE)})
-    if gen_tag:
-        content = gen_tag.get("content", "")
+    content = page_data.generator
+    if content:
         m = vp.search(content)
         if m:
             return m.group(1)
     return None
 
 
-def detect_cms(page_data: dict) -> dict:
-    """Run all CMS signature checks and return the best match.
-
-    Returns dict:
-        cms: str | None
-        confidence: int (0-100)
-        signals: list[str]
-        version: str | None
-    """
-    scores: dict[str, int] = {}
-    signals: dict[str, list[str]] = {}
-
-    for cms_name, checks in CMS_SIGNATURES.items():
-        total = 0
-        matched_signals = []
-        for check in checks:
-            checker = _CHECK_DISPATCH.get(check["type"])
-            if checker and checker(check, page_data):
-                total += check["weight"]
-                # Enrich the signal description with actual matched value where useful
-                desc = check["description"]
-                if check["type"] == "meta_generator":
-                    soup = page_data.get("soup")
-                    if soup:
-                        gen_tag = soup.find(
-                            "meta",
-                            attrs={"name": re.compile(r"generator", re.IGNORECASE)},
-                        )
-                        if gen_tag and gen_tag.get("content"):
-                            desc = f"meta_generator: {gen_tag['content']}"
-                matched_signals.append(desc)
-        if total > 0:
-            scores[cms_name] = total
-            signals[cms_name] = matched_signals
-
-    if not scores:
-        return {"cms": None, "confidence": 0, "signals": [], "version": None}
-
-    # Pick the CMS with the highest score
-    winner = max(scores, key=scores.get)
-    winner_score = scores[winner]
-
-    if winner_score < DETECTION_THRESHOLD:
-        return {"cms": None, "confidence": 0, "signals": [], "version": None}
-
-    # Calculate max possible score for this CMS
-    max_possible = sum(c["weight"] for c in CMS_SIGNATURES[winner])
-    confidence = min(100, int((winner_score / max_possible) * 100))
-
-    version = _extract_version(winner, page_data)
-
-    return {
-        "cms": winner,
-        "confidence": confidence,
-        "signals": signals[winner],
-        "version": version,
+def detect_cms(
+    page_data: PageData,
+    previous: DetectionResult | None = None,
+    full: bool = False,
+    margin: int = 0,
+) -> DetectionResult:
+    """Run the CMS signature checks and return the best match.
+
+    The cheap checks run first. HTML checks of a CMS are skipped once it
+    cannot come within ``margin`` points of the leader, so the winner, its
+    confidence, signals and version are exact while the scores of CMSes
+    that fell out of contention may be low. ``full`` evaluates every check.
+
+    With ``previous``, an earlier result for the same page, its matches
+    are reused and only probe checks (plus any skipped HTML checks the
+    probes brought back into contention) are matched again: the cheap
+    rescore after ``probe_page``. Timings then add up across both passes.
+    """
+    index = SIGNATURE_INDEX
+    started = time.perf_counter()
+    page_data.generator
+    parsed = time.perf_counter()
+    if previous is None:
+        matched, skipped = _match_checks(page_data, full, margin)
+    else:
+        matched = set(previous.matched_checks) | index.match_probes(page_data.probes)
+        matched, skipped = _match_html(page_data, matched, previous.skipped_checks, full, margin)
+    matched_at = time.perf_counter()
+    scores = index.score(index.mask(matched))
+    ranked = index.ranked(scores)
+    matched = frozenset(matched)
+
+    confidences = index.confidences(scores).tolist()
+    technologies = {
+        category: [
+            {
+                "name": index.names[row_id],
+                "confidence": confidences[row_id],
+                "signals": _signals(row_id, matched, page_data),
+            }
+            for row_id in row_ids
+        ]
+        for category, row_ids in index.detected(scores, DETECTION_THRESHOLD).items()
+    }
+
+    # Pick the CMS with the highest score (the first one listed on a tie)
+    winner_id = int(np.argmax(scores[: index.n_cms]))
+    winner_score = int(scores[winner_id])
+    timings = {
+        "parse": _ms(parsed - started),
+        "match": _ms(matched_at - parsed),
+        "score": _ms(time.perf_counter() - matched_at),
     }
+    if previous is not None:
+        timings = {k: round(v + previous.timings.get(k, 0.0), 2) for k, v in timings.items()}
+
+    if winner_score <= 0 or winner_score < DETECTION_THRESHOLD:
+        return DetectionResult(
+            scores=ranked,
+            technologies=technologies,
+            timings=timings,
+            matched_checks=matched,
+            skipped_checks=skipped,
+        )
+
+    winner = index.cms_names[winner_id]
+    return DetectionResult(
+        cms=winner,
+        confidence=confidences[winner_id],
+        signals=_signals(winner_id, matched, page_data),
+        version=_extract_version(winner, page_data),
+        scores=ranked,
+        technologies=technologies,
+        timings=timings,
+        matched_checks=matched,
+        skipped_checks=skipped,
+    )
+
+
+# ---------- Secondary path probes ----------
+
+# Bytes of each probe response kept for matching.
+_PROBE_MAX_BYTES = 64 * 1024
+
+
+def probe_paths(
+    result: DetectionResult, candidates: int = 2, margin: int = 20, max_requests: int = 3
+) -> list[str]:
+    """Paths worth probing when the homepage left ``result`` open.
+
+    A result is open when some CMS scored but none was detected, or the
+    leader is less than ``margin`` points ahead of the runner-up. The
+    probes of the ``candidates`` best-scoring CMSes that have any are
+    returned, heaviest first per CMS, at most ``max_requests`` paths.
+    Pages with no signal at all are never probed.
+    """
+    ranked = result.scores
+    if not ranked or ranked[0]["score"] <= 0:
+        return []
+    runner_up = ranked[1]["score"] if len(ranked) > 1 else 0
+    if result.cms is not None and ranked[0]["score"] - runner_up >= margin:
+        return []
+
+    index = SIGNATURE_INDEX
+    paths: list[str] = []
+    taken = 0
+    for entry in ranked:
+        if taken >= candidates or entry["score"] <= 0:
+            break
+        probe_ids = index.cms_probe_ids[index.cms_names.index(entry["cms"])]
+        if not probe_ids:
+            continue
+        taken += 1
+        for check_id in probe_ids:
+            path = index.checks[check_id]["path"]
+            if path not in paths:
+                paths.append(path)
+    return paths[:max_requests]
+
+
+async def probe_page(
+    page_data: PageData,
+    paths: list[str],
+    client: httpx.AsyncClient | None = None,
+    timeout: float = 3.0,
+) -> None:
+    """Fetch ``paths`` on the page's final origin into ``page_data.probes``.
+
+    The requests run concurrently on the shared client, so they reuse the
+    homepage's pooled connection where they can. Whatever has not answered
+    within ``timeout`` seconds is cancelled; failed probes are left out.
+    """
+    if not paths:
+        return
+    if client is None:
+        async with create_client() as own_client:
+            return await probe_page(page_data, paths, own_client, timeout)
+
+    origin = urlparse(page_data.url_final)
+    base = f"{origin.scheme}://{origin.netloc}"
+    tasks = {asyncio.create_task(_fetch_probe(client, base + path)): path for path in paths}
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        if task.exception() is None:
+            page_data.probes[tasks[task]] = task.result()
+
+
+async def _fetch_probe(client: httpx.AsyncClient, url: str) -> tuple[int, str]:
+    """(status, decoded body prefix) of one probe request."""
+    headers = {"User-Agent": _USER_AGENT, "Accept": "*/*"}
+    async with _stream(client, url, headers) as resp:
+        body = bytearray()
+        async for chunk in resp.aiter_bytes():
+            body += chunk
+            if len(body) >= _PROBE_MAX_BYTES:
+                break
+        del body[_PROBE_MAX_BYTES:]
+        return resp.status_code, decode_body(body, resp.charset_encoding)
+
+
+# ---------- Detection off the event loop ----------
+
+
+def create_detect_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for ``detect_cms``, warmed up before its first job.
+
+    Workers are spawned rather than forked so they never inherit the
+    parent's event loop or open sockets; each imports this module, which
+    compiles the signature index once per worker.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_up_worker,
+    )
+
+
+def _warm_up_worker() -> None:
+    # Build the shared matcher caches with a throwaway page.
+    detect_cms(PageData(html="<html></html>"))
+
+
+async def detect_cms_async(
+    page_data: PageData,
+    executor: Executor | None = None,
+    full: bool = False,
+    margin: int = 0,
+    previous: DetectionResult | None = None,
+) -> DetectionResult:
+    """``detect_cms`` for async callers.
+
+    With an ``executor`` (see ``create_detect_pool``) the page is shipped to
+    a worker, so regex scans and generator parsing of large pages do not
+    stall the event loop. Without one it runs inline. ``previous`` is
+    passed through for rescoring.
+    """
+    if executor is None:
+        return detect_cms(page_data, previous, full, margin)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, detect_cms, page_data, previous, full, margin)
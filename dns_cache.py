@@ -0,0 +1,281 @@
+"""Async DNS resolution with a TTL cache, plugged into the HTTP client.
+
+``DNSCache`` resolves hostnames to addresses and caches answers, positive
+and negative. Concurrent lookups of one name share a single query. With
+the optional ``aiodns`` package, lookups use c-ares (A and AAAA together)
+and honour record TTLs. Without it, they go through the event loop's
+``getaddrinfo`` and are cached for ``default_ttl``.
+``CachingNetworkBackend`` makes httpcore connect through the cache, so the
+HTTPS attempt, the HTTP fallback and every redirect to the same host share
+one lookup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import itertools
+import socket
+import time
+import typing
+from collections import OrderedDict
+
+import httpcore
+
+try:
+    import aiodns
+except ImportError:  # optional: fall back to the loop's getaddrinfo
+    aiodns = None
+
+# Head start each address of a host gets before the next one is tried
+# alongside it (RFC 8305's recommended connection attempt delay).
+_CONNECT_ATTEMPT_DELAY = 0.25
+
+
+class DNSCache:
+    """TTL cache of hostname -> addresses.
+
+    Positive answers live for their record TTL clamped to
+    [``min_ttl``, ``max_ttl``] (``default_ttl`` when the resolver reports
+    none). Failures are cached for ``negative_ttl``. At most
+    ``max_entries`` names are kept (LRU). ``prefetch`` warms names that
+    will be fetched soon, with at most ``prefetch_concurrency`` lookups
+    running at once.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 60.0,
+        min_ttl: float = 5.0,
+        max_ttl: float = 3600.0,
+        negative_ttl: float = 30.0,
+        max_entries: int = 10_000,
+        prefetch_concurrency: int = 10,
+        timeout: float = 5.0,
+    ) -> None:
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.prefetch_concurrency = prefetch_concurrency
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        # host -> (expires_at, addresses or the OSError the lookup raised)
+        self._entries: OrderedDict[str, tuple[float, list[str] | OSError]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._prefetching: set[asyncio.Task] = set()
+        self._prefetch_slots: asyncio.Semaphore | None = None
+        self._resolver = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cached(self, host: str) -> list[str] | OSError | None:
+        entry = self._entries.get(host)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[host]
+            return None
+        self._entries.move_to_end(host)
+        return value
+
+    def _store(self, host: str, ttl: float, value: list[str] | OSError) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[host] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def resolve(self, host: str) -> list[str]:
+        """Addresses for ``host``; raises OSError if it does not resolve."""
+        cached = self._cached(host)
+        if cached is not None:
+            self.hits += 1
+            if isinstance(cached, OSError):
+                raise cached
+            return cached
+        self.misses += 1
+
+        future = self._inflight.get(host)
+        if future is None:
+            future = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = future
+            future.add_done_callback(lambda _: self._inflight.pop(host, None))
+        return await asyncio.shield(future)
+
+    async def first_address(self, host: str) -> str | None:
+        """First address of ``host``, or None if it does not resolve."""
+        try:
+            addresses = await self.resolve(host)
+        except OSError:
+            return None
+        return addresses[0] if addresses else None
+
+    async def _lookup(self, host: str) -> list[str]:
+        try:
+            addresses, ttl = await asyncio.wait_for(self._query(host), self.timeout)
+        except asyncio.TimeoutError:
+            # A slow resolver is not an answer; do not cache it.
+            raise socket.gaierror(socket.EAI_AGAIN, f"DNS lookup of {host} timed out")
+        except OSError as exc:
+            self._store(host, self.negative_ttl, exc)
+            raise
+        if not addresses:
+            exc = socket.gaierror(socket.EAI_NONAME, f"{host} has no addresses")
+            self._store(host, self.negative_ttl, exc)
+            raise exc
+        if ttl is None:
+            ttl = self.default_ttl
+        self._store(host, min(self.max_ttl, max(self.min_ttl, ttl)), addresses)
+        return addresses
+
+    async def _query(self, host: str) -> tuple[list[str], float | None]:
+        """(addresses, ttl or None) from aiodns if installed, else getaddrinfo."""
+        if aiodns is not None:
+            if self._resolver is None:
+                self._resolver = aiodns.DNSResolver()
+            answers = await asyncio.gather(
+                self._resolver.query(host, "A"),
+                self._resolver.query(host, "AAAA"),
+                return_exceptions=True,
+            )
+            families = []
+            for answer in answers:
+                if isinstance(answer, aiodns.error.DNSError):
+                    continue  # e.g. no records of this family
+                if isinstance(answer, BaseException):
+                    raise answer
+                families.append(answer)
+            if not families:
+                raise socket.gaierror(socket.EAI_NONAME, f"{host}: {answers[0]}")
+            # Alternate families so the connect fallback tries the other one.
+            records = _interleave(*families)
+            ttls = [r.ttl for r in records if getattr(r, "ttl", None) is not None]
+            return [r.host for r in records], (min(ttls) if ttls else None)
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        return addresses, None
+
+    def prefetch(self, host: str) -> None:
+        """Start resolving ``host`` in the background unless already known."""
+        if host in self._inflight or self._cached(host) is not None:
+            return
+        if self._prefetch_slots is None:
+            self._prefetch_slots = asyncio.Semaphore(self.prefetch_concurrency)
+        task = asyncio.ensure_future(self._prefetch(host))
+        self._prefetching.add(task)
+        task.add_done_callback(self._prefetching.discard)
+
+    async def _prefetch(self, host: str) -> None:
+        async with self._prefetch_slots:
+            try:
+                await self.resolve(host)
+            except OSError:
+                pass
+
+
+_MISSING = object()
+
+
+def _interleave(*lists: list) -> list:
+    """Items of ``lists`` taken in turn: a0, b0, a1, b1, ..."""
+    return [
+        item
+        for group in itertools.zip_longest(*lists, fillvalue=_MISSING)
+        for item in group
+        if item is not _MISSING
+    ]
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that resolves hostnames through a DNSCache.
+
+    TLS still uses the original hostname for SNI and certificate checks;
+    only the TCP connect goes to the cached address. Every address is
+    tried, each with a short head start (happy eyeballs), within one
+    shared connect timeout.
+    """
+
+    def __init__(self, cache: DNSCache, backend: httpcore.AsyncNetworkBackend | None = None) -> None:
+        self.cache = cache
+        self._backend = backend if backend is not None else httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: typing.Iterable[httpcore.SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        if _is_ip(host):
+            addresses = [host]
+        else:
+            try:
+                addresses = await self.cache.resolve(host)
+            except OSError as exc:
+                raise httpcore.ConnectError(str(exc)) from exc
+
+        socket_options = list(socket_options or ())
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        async def attempt(address: str) -> httpcore.AsyncNetworkStream:
+            left = None if deadline is None else max(0.0, deadline - loop.time())
+            return await self._backend.connect_tcp(
+                address, port, left, local_address, socket_options
+            )
+
+        # Happy eyeballs: start the next address when the current attempts
+        # fail or stall for _CONNECT_ATTEMPT_DELAY; the first to connect wins.
+        remaining = iter(addresses)
+        pending: set[asyncio.Task] = set()
+        error: Exception | None = None
+        try:
+            while True:
+                address = next(remaining, None)
+                if address is not None:
+                    pending.add(asyncio.ensure_future(attempt(address)))
+                elif not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=_CONNECT_ATTEMPT_DELAY if address is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                streams = [task.result() for task in done if task.exception() is None]
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                if streams:
+                    for extra in streams[1:]:
+                        await extra.aclose()
+                    return streams[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, httpcore.AsyncNetworkStream):
+                    await result.aclose()
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
@@ -0,0 +1,242 @@
+"""In-process metrics with Prometheus text exposition.
+
+Each worker process keeps its own counters and histograms in plain dicts.
+They are only touched from that worker's event loop, so updates need no
+lock. With several workers, each one periodically writes a snapshot to a
+shared directory (``Registry.write_snapshot``), and whichever worker
+serves a scrape adds the other workers' latest snapshots to its own live
+values (``Registry.render``). A worker removes its snapshot when it shuts
+down; gauges from snapshots that stopped being refreshed (a killed worker)
+are left out, while their counters still count.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from collections.abc import Callable, Iterable, Sequence
+
+# Latency buckets in seconds, from a cached hit up to the fetch timeout.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> dict[LabelValues, float]:
+        return self.values
+
+    def merge(self, into: dict[LabelValues, float], samples: Iterable[tuple[list, float]]) -> None:
+        for key, value in samples:
+            key = tuple(key)
+            into[key] = into.get(key, 0) + value
+
+    def lines(self, samples: dict[LabelValues, float]) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(samples.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value read from a callback at scrape time; summed across workers."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        super().__init__(name, help)
+        self.read = read
+
+    def samples(self) -> dict[LabelValues, float]:
+        return {(): self.read()}
+
+
+class Histogram:
+    """Bucketed observations per label combination, with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label key: one count per bucket (not cumulative), then sum, then count.
+        self.values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self) -> dict[LabelValues, list[float]]:
+        return self.values
+
+    def merge(self, into: dict[LabelValues, list[float]], samples: Iterable[tuple[list, list]]) -> None:
+        for key, state in samples:
+            if len(state) != len(self.buckets) + 2:
+                continue  # written with other buckets, e.g. by an older release
+            key = tuple(key)
+            current = into.get(key)
+            if current is None:
+                into[key] = list(state)
+            else:
+                into[key] = [a + b for a, b in zip(current, state)]
+
+    def lines(self, samples: dict[LabelValues, list[float]]) -> list[str]:
+        out = []
+        names = (*self.labelnames, "le")
+        for key, state in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(names, (*key, _format_value(bound)))
+                out.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            # Observations above the last bound only show up in +Inf.
+            labels = _format_labels(names, (*key, "+Inf"))
+            out.append(f"{self.name}_bucket{labels} {_format_value(state[-1])}")
+            plain = _format_labels(self.labelnames, key)
+            out.append(f"{self.name}_sum{plain} {_format_value(state[-2])}")
+            out.append(f"{self.name}_count{plain} {_format_value(state[-1])}")
+        return out
+
+
+class Registry:
+    """Named metrics of one worker, rendered together."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Histogram] = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help, read))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    # ---------- Multi-worker snapshots ----------
+
+    def snapshot(self) -> dict[str, list]:
+        """This worker's samples as JSON-serializable data."""
+        return {
+            name: [[list(key), value] for key, value in metric.samples().items()]
+            for name, metric in self.metrics.items()
+        }
+
+    def write_snapshot(self, directory: str) -> None:
+        """Atomically replace this worker's snapshot file in ``directory``."""
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def remove_snapshot(self, directory: str) -> None:
+        """Delete this worker's snapshot file, e.g. when it shuts down."""
+        try:
+            os.remove(os.path.join(directory, f"metrics-{os.getpid()}.json"))
+        except FileNotFoundError:
+            pass
+
+    def _peer_snapshots(self, directory: str) -> Iterable[tuple[dict[str, list], float]]:
+        """(snapshot, seconds since it was written) of every other worker."""
+        own = f"metrics-{os.getpid()}.json"
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        now = time.time()
+        for name in names:
+            if name == own or not name.startswith("metrics-") or not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    age = now - os.fstat(f.fileno()).st_mtime
+                    yield json.load(f), age
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or gone
+
+    # ---------- Exposition ----------
+
+    def render(self, directory: str | None = None, stale_after: float | None = None) -> str:
+        """Prometheus text format: live samples plus peers' snapshots in ``directory``.
+
+        Gauges of snapshots older than ``stale_after`` seconds are skipped:
+        their worker is gone, so its current values are not current.
+        """
+        merged = {name: dict(metric.samples()) for name, metric in self.metrics.items()}
+        if directory:
+            for snapshot, age in self._peer_snapshots(directory):
+                stale = stale_after is not None and age > stale_after
+                for name, samples in snapshot.items():
+                    metric = self.metrics.get(name)
+                    if metric is None or (stale and metric.kind == "gauge"):
+                        continue
+                    metric.merge(merged[name], samples)
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.lines(merged[name]))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,209 @@
+"""Per-origin politeness for outbound fetches.
+
+``PolitenessScheduler.slot(domain)`` is held around each fetch. It caps
+concurrent fetches per registrable domain (so ``a.myshopify.com`` and
+``b.myshopify.com`` share a budget) and per resolved IP, spaces request
+starts to one registrable domain by a minimum delay, and backs off a
+registrable domain that answered 429 or 503.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
+# Second-level labels that, under a two-letter country TLD, are part of the
+# public suffix (example.co.uk, example.com.au). An approximation of the
+# Public Suffix List's ICANN section, so hosting platforms such as
+# myshopify.com group all their shops under one registrable domain.
+_GENERIC_SLDS = frozenset({"ac", "co", "com", "edu", "gob", "gov", "ltd", "net", "nic", "or", "org", "plc"})
+
+# Origins kept before idle ones are pruned (grows with the live set).
+_PRUNE_MIN = 1024
+
+
+def registrable_domain(host: str) -> str:
+    """The registrable part of ``host``: ``shop.example.co.uk`` -> ``example.co.uk``."""
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _GENERIC_SLDS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+async def resolve_ip(host: str, timeout: float = 2.0) -> str | None:
+    """First address ``host`` resolves to, or None if it does not resolve in time."""
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(
+            loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+    return infos[0][4][0] if infos else None
+
+
+class SlotUnavailable(Exception):
+    """A fetch slot for the domain would not be free within max_wait."""
+
+    def __init__(self, domain: str, retry_after: float, message: str | None = None) -> None:
+        super().__init__(message or f"No slot for {domain} within {retry_after:.0f}s")
+        self.domain = domain
+        self.retry_after = retry_after
+
+
+class BackingOff(SlotUnavailable):
+    """The origin asked us to slow down (429/503) and would not be free within max_wait."""
+
+    def __init__(self, domain: str, retry_after: float) -> None:
+        super().__init__(domain, retry_after, f"Backing off {domain} for {retry_after:.0f}s")
+
+
+class QueueFull(SlotUnavailable):
+    """So many fetches to the domain are queued that spacing alone exceeds max_wait."""
+
+    def __init__(self, domain: str, retry_after: float) -> None:
+        message = f"Too many fetches queued for {domain}; next start in {retry_after:.0f}s"
+        super().__init__(domain, retry_after, message)
+
+
+class _Origin:
+    """Scheduling state for one registrable domain or IP."""
+
+    __slots__ = ("slots", "users", "next_start", "backoff_until", "failures")
+
+    def __init__(self, limit: int) -> None:
+        self.slots = asyncio.Semaphore(limit)
+        self.users = 0
+        self.next_start = 0.0
+        self.backoff_until = 0.0
+        self.failures = 0
+
+
+class PolitenessScheduler:
+    """Concurrency caps, spacing and backoff per registrable domain and IP.
+
+    ``per_domain`` and ``per_ip`` cap concurrent fetches (0 disables a
+    cap). Request starts to one registrable domain are at least
+    ``min_delay`` seconds apart. After a 429 or 503 the registrable domain
+    is paused for its Retry-After, or ``backoff_base`` doubled per
+    consecutive failure, capped at ``backoff_max``. A fetch that would
+    have to wait longer than ``max_wait`` raises instead: ``BackingOff``
+    when the origin's backoff alone is that long, else ``QueueFull``.
+    """
+
+    def __init__(
+        self,
+        per_domain: int = 4,
+        per_ip: int = 8,
+        min_delay: float = 0.1,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+        max_wait: float = 10.0,
+        resolve: Callable[[str], Awaitable[str | None]] | None = resolve_ip,
+    ) -> None:
+        self.per_domain = per_domain
+        self.per_ip = per_ip
+        self.min_delay = min_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.resolve = resolve
+        self._domains: dict[str, _Origin] = {}
+        self._ips: dict[str, _Origin] = {}
+        self._prune_at = _PRUNE_MIN
+
+    def _origin(self, table: dict[str, _Origin], key: str, limit: int) -> _Origin:
+        origin = table.get(key)
+        if origin is None:
+            if len(table) >= self._prune_at:
+                self._prune(table)
+            origin = table[key] = _Origin(limit)
+        origin.users += 1
+        return origin
+
+    def _release(self, table: dict[str, _Origin], key: str, origin: _Origin) -> None:
+        origin.users -= 1
+        # Forget idle origins unless they still carry spacing or backoff.
+        if origin.users == 0 and origin.next_start <= time.monotonic():
+            table.pop(key, None)
+
+    def _prune(self, table: dict[str, _Origin]) -> None:
+        """Drop idle origins whose spacing or backoff has run out."""
+        now = time.monotonic()
+        idle = [k for k, o in table.items() if o.users == 0 and o.next_start <= now]
+        for k in idle:
+            del table[k]
+        self._prune_at = max(_PRUNE_MIN, 2 * len(table))
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Hold a fetch slot for ``host`` for the duration of the block."""
+        key = registrable_domain(host)
+        domain = self._origin(self._domains, key, self.per_domain or 1)
+        ip = ip_origin = None
+        try:
+            # Wait out spacing and backoff before taking any slot, reserving
+            # this start time so concurrent waiters queue up behind it.
+            now = time.monotonic()
+            start_at = max(now, domain.next_start)
+            if start_at - now > self.max_wait:
+                if domain.backoff_until - now > self.max_wait:
+                    raise BackingOff(key, start_at - now)
+                raise QueueFull(key, start_at - now)
+            domain.next_start = start_at + self.min_delay
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+
+            async with _maybe(domain.slots, self.per_domain > 0):
+                if self.per_ip > 0 and self.resolve is not None:
+                    ip = await self.resolve(host)
+                    if ip is not None:
+                        ip_origin = self._origin(self._ips, ip, self.per_ip)
+                if ip_origin is not None:
+                    async with ip_origin.slots:
+                        yield
+                else:
+                    yield
+        finally:
+            if ip_origin is not None:
+                self._release(self._ips, ip, ip_origin)
+            self._release(self._domains, key, domain)
+
+    def report(self, host: str, status_code: int, retry_after: str | None = None) -> None:
+        """Record an origin's answer; 429 and 503 start or extend a backoff."""
+        key = registrable_domain(host)
+        origin = self._domains.get(key)
+        if status_code not in (429, 503):
+            if origin is not None:
+                origin.failures = 0
+            return
+        if origin is None:
+            origin = self._domains[key] = _Origin(self.per_domain or 1)
+        origin.failures += 1
+        delay = _parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.backoff_base * 2 ** (origin.failures - 1)
+        origin.backoff_until = max(origin.backoff_until, time.monotonic() + min(delay, self.backoff_max))
+        origin.next_start = max(origin.next_start, origin.backoff_until)
+
+
+@asynccontextmanager
+async def _maybe(semaphore: asyncio.Semaphore, enabled: bool) -> AsyncIterator[None]:
+    if not enabled:
+        yield
+        return
+    async with semaphore:
+        yield
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds form only)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value.strip()))
+    except ValueError:
+        return None
@@ -0,0 +1,235 @@
+"""Per-client rate limiting with a sliding-window counter.
+
+Each client key holds three numbers: the current fixed window, the count
+in it and the count in the window before. The request rate is estimated
+as the previous count, weighted by how much of the previous window still
+overlaps the sliding one, plus the current count. State is O(1) per key,
+keys idle for two windows are swept, and storage is pluggable so workers
+can share limits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+# (window index, count in the previous window, count in this window)
+WindowState = tuple[int, int, int]
+
+
+class Decision(NamedTuple):
+    limited: bool
+    remaining: int
+    retry_after: int  # seconds until a request would be allowed; 0 if allowed
+
+
+def sliding_window(
+    state: WindowState | None, limit: int, window: float, now: float, cost: int = 1
+) -> tuple[WindowState, Decision]:
+    """Count ``cost`` requests against ``state``; return the new state and the decision.
+
+    A rejected request is not counted. ``cost`` must be between 1 and
+    ``limit``; a larger one could never be allowed.
+    """
+    index = int(now // window)
+    if state is None or state[0] < index - 1:
+        previous, current = 0, 0
+    elif state[0] == index - 1:
+        previous, current = state[2], 0
+    else:
+        previous, current = state[1], state[2]
+
+    elapsed = now - index * window
+    overlap = (window - elapsed) / window
+    estimate = previous * overlap + current
+    if estimate + cost > limit:
+        retry_after = _retry_after(previous, current, limit, window, elapsed, cost)
+        return (index, previous, current), Decision(True, 0, retry_after)
+    current += cost
+    remaining = max(0, math.floor(limit - estimate - cost))
+    return (index, previous, current), Decision(False, remaining, 0)
+
+
+def _retry_after(
+    previous: int, current: int, limit: int, window: float, elapsed: float, cost: int = 1
+) -> int:
+    """Seconds until the estimate leaves room for ``cost`` more requests."""
+    room = limit - cost
+    if current > room:
+        # Only the next window helps; there this window's count is "previous".
+        wait = window - elapsed + window * (1 - room / current)
+        return max(1, math.ceil(wait))
+    # previous * (window - elapsed - t) / window + current <= limit - cost
+    wait = window - elapsed - (room - current) * window / previous
+    return max(1, math.ceil(wait))
+
+
+# ---------- Storage backends ----------
+
+
+class RateLimitBackend:
+    """Storage interface for RateLimiter: apply ``sliding_window`` atomically."""
+
+    # True when hit() and sweep() may block on I/O or locks; RateLimiter
+    # then runs them on a helper thread instead of the event loop.
+    blocking = False
+
+    def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> Decision:
+        raise NotImplementedError
+
+    def sweep(self, now: float, window: float) -> int:
+        """Drop keys idle long enough to have no effect; return how many."""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Process-local store.
+
+    Callers run on one event loop and ``hit`` never awaits, so no lock is
+    needed.
+    """
+
+    def __init__(self) -> None:
+        self._state: dict[str, WindowState] = {}
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> Decision:
+        state, decision = sliding_window(self._state.get(key), limit, window, now, cost)
+        self._state[key] = state
+        return decision
+
+    def sweep(self, now: float, window: float) -> int:
+        oldest_live = int(now // window) - 1
+        idle = [key for key, state in self._state.items() if state[0] < oldest_live]
+        for key in idle:
+            del self._state[key]
+        return len(idle)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    window_index INTEGER NOT NULL,
+    previous INTEGER NOT NULL,
+    current INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rate_limits_window ON rate_limits (window_index);
+"""
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Window counters in a SQLite table, so workers on one host share limits.
+
+    Each hit is one short immediate transaction, so concurrent workers
+    serialize on the write lock and never double-count. Waiting for that
+    lock blocks, so RateLimiter.check_async keeps it off the event loop.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str) -> None:
+        # Opened here, used from RateLimiter's helper thread.
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> Decision:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = conn.execute(
+                "SELECT window_index, previous, current FROM rate_limits WHERE key = ?",
+                (key,),
+            ).fetchone()
+            state, decision = sliding_window(state, limit, window, now, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window_index, previous, current)"
+                " VALUES (?, ?, ?, ?)",
+                (key, *state),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return decision
+
+    def sweep(self, now: float, window: float) -> int:
+        cursor = self._conn.execute(
+            "DELETE FROM rate_limits WHERE window_index < ?", (int(now // window) - 1,)
+        )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ---------- Limiter ----------
+
+
+class RateLimiter:
+    """Allow at most ``limit`` requests per ``window`` seconds per key.
+
+    ``limit <= 0`` disables limiting. Idle keys are swept from the backend
+    at most every ``sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float = 60.0,
+        backend: RateLimitBackend | None = None,
+        sweep_interval: float = 60.0,
+    ) -> None:
+        self.limit = limit
+        self.window = window
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self._executor: ThreadPoolExecutor | None = None
+
+    def check(self, key: str, cost: int = 1) -> Decision:
+        """Count ``cost`` requests from ``key`` unless that goes over the limit.
+
+        Raises ValueError if ``cost`` is above the limit, since no wait
+        would make room for it.
+        """
+        if self.limit <= 0:
+            return Decision(False, 0, 0)
+        if not 1 <= cost <= self.limit:
+            raise ValueError(f"cost {cost} is outside 1..{self.limit}")
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.backend.sweep(now, self.window)
+        return self.backend.hit(key, self.limit, self.window, now, cost)
+
+    async def check_async(self, key: str, cost: int = 1) -> Decision:
+        """``check`` for async callers.
+
+        Blocking backends run on one helper thread, which also serializes
+        their use of a single connection.
+        """
+        if self.limit <= 0 or not self.backend.blocking:
+            return self.check(key, cost)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.check, key, cost)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.backend.close()
@@ -0,0 +1,322 @@
+"""Detection result cache keyed by normalized domain, with pluggable storage."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cms_signatures import SIGNATURES_VERSION
+
+# A cached value is the (status_code, content) pair the detect path returns.
+CachedResult = tuple[int, dict]
+
+
+# ---------- Storage backends ----------
+
+
+class CacheBackend:
+    """Storage interface for ResultCache.
+
+    Expiry times are wall-clock (``time.time()``) so they stay meaningful
+    for backends that outlive the process.
+    """
+
+    def get(self, key: str) -> tuple[float, CachedResult] | None:
+        """Return (expires_at, value) for ``key``, or None."""
+        raise NotImplementedError
+
+    def set(self, key: str, expires_at: float, value: CachedResult) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def sweep(self, now: float) -> int:
+        """Drop entries that expired before ``now``; return how many."""
+        return 0
+
+    def flush(self) -> None:
+        """Persist buffered writes, if the backend buffers any."""
+
+    def flush_due(self) -> None:
+        """Start persisting writes buffered for too long, without waiting."""
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Process-local LRU store holding at most ``max_entries`` results.
+
+    ``max_entries=0`` stores nothing.
+    """
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, CachedResult]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[float, CachedResult] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, expires_at: float, value: CachedResult) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def sweep(self, now: float) -> int:
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    domain TEXT PRIMARY KEY,
+    url_final TEXT,
+    status_code INTEGER NOT NULL,
+    cms TEXT,
+    confidence INTEGER,
+    version TEXT,
+    body TEXT NOT NULL,
+    signatures_version TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at);
+"""
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-disk store shared by every worker that opens the same file.
+
+    The database runs in WAL mode so readers never block the writer, and
+    ``get`` reads on the caller's thread. Writes are buffered and committed
+    ``write_batch`` at a time, or once the oldest has waited
+    ``max_write_delay`` seconds, on a writer thread with its own connection,
+    so waiting for the write lock never blocks the event loop; buffered
+    and in-flight entries are still served by ``get``. Deletes and sweeps
+    run on the writer thread too, and ``flush`` waits for all of it. Rows
+    written under a different ``signatures_version`` are treated as misses.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        write_batch: int = 50,
+        signatures_version: str = SIGNATURES_VERSION,
+        max_write_delay: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.write_batch = write_batch
+        self.signatures_version = signatures_version
+        self.max_write_delay = max_write_delay
+        self._pending: dict[str, tuple[float, CachedResult]] = {}
+        self._pending_since = 0.0  # monotonic time the oldest pending entry was set
+        # Batches handed to the writer thread and not yet committed.
+        self._writing: list[dict[str, tuple[float, CachedResult]]] = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache")
+        self._writer_conn: sqlite3.Connection | None = None
+        self._last_write: Future | None = None
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str) -> tuple[float, CachedResult] | None:
+        self.flush_due()
+        entry = self._pending.get(key)
+        if entry is not None:
+            return entry
+        for batch in reversed(self._writing):
+            entry = batch.get(key)
+            if entry is not None:
+                return entry
+        row = self._conn.execute(
+            "SELECT expires_at, status_code, body FROM results"
+            " WHERE domain = ? AND signatures_version = ?",
+            (key, self.signatures_version),
+        ).fetchone()
+        if row is None:
+            return None
+        expires_at, status_code, body = row
+        return expires_at, (status_code, json.loads(body))
+
+    def set(self, key: str, expires_at: float, value: CachedResult) -> None:
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending[key] = (expires_at, value)
+        if len(self._pending) >= self.write_batch:
+            self._write_pending()
+        else:
+            self.flush_due()
+
+    def delete(self, key: str) -> None:
+        self._pending.pop(key, None)
+        self._submit(self._execute, "DELETE FROM results WHERE domain = ?", (key,))
+
+    def sweep(self, now: float) -> int:
+        """Queue the sweep on the writer thread; the count is not waited for."""
+        self._submit(
+            self._execute,
+            "DELETE FROM results WHERE expires_at <= ? OR signatures_version != ?",
+            (now, self.signatures_version),
+        )
+        return 0
+
+    def flush(self) -> None:
+        self._write_pending()
+        if self._last_write is not None:
+            self._last_write.result()
+
+    def flush_due(self) -> None:
+        if self._pending and time.monotonic() - self._pending_since >= self.max_write_delay:
+            self._write_pending()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._submit(self._close_writer_conn).result()
+            self._writer.shutdown(wait=True)
+            self._conn.close()
+
+    def _submit(self, fn, *args) -> Future:
+        # One writer thread runs everything in submission order.
+        self._last_write = self._writer.submit(fn, *args)
+        return self._last_write
+
+    def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._writing.append(batch)
+        self._submit(self._write_batch, batch)
+
+    # The methods below run on the writer thread.
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._writer_conn is None:
+            self._writer_conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._writer_conn.execute("PRAGMA synchronous=NORMAL")
+        return self._writer_conn
+
+    def _close_writer_conn(self) -> None:
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        self._writer_connection().execute(sql, params)
+
+    def _write_batch(self, batch: dict[str, tuple[float, CachedResult]]) -> None:
+        """Commit ``batch`` in one transaction. A failed batch is dropped."""
+        now = time.time()
+        rows = [
+            (
+                key,
+                content.get("url_checked"),
+                status_code,
+                content.get("cms"),
+                content.get("confidence"),
+                content.get("version"),
+                json.dumps(content),
+                self.signatures_version,
+                now,
+                expires_at,
+            )
+            for key, (expires_at, (status_code, content)) in batch.items()
+        ]
+        conn = self._writer_connection()
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO results (domain, url_final, status_code, cms,"
+                    " confidence, version, body, signatures_version, created_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        finally:
+            self._writing.remove(batch)
+
+
+# ---------- Cache policy ----------
+
+
+class ResultCache:
+    """TTL policy over a CacheBackend.
+
+    Entries expire after ``ttl`` seconds when a CMS was detected, after
+    ``negative_ttl`` when none was, and after ``error_ttl`` for any other
+    status (the API stores fetch errors, 502/504, here). Expired entries are swept from the backend at most
+    every ``sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend | None = None,
+        ttl: float = 86_400.0,
+        negative_ttl: float = 600.0,
+        error_ttl: float = 60.0,
+        sweep_interval: float = 300.0,
+    ) -> None:
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def _ttl_for(self, value: CachedResult) -> float:
+        status_code, content = value
+        if status_code != 200:
+            return self.error_ttl
+        if content.get("cms") is None:
+            return self.negative_ttl
+        return self.ttl
+
+    def get(self, key: str) -> CachedResult | None:
+        """Return the live entry for ``key``, or None if absent or expired."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            self.backend.delete(key)
+            return None
+        return value
+
+    def put(self, key: str, value: CachedResult) -> None:
+        """Store ``value`` under ``key`` with the TTL its outcome calls for."""
+        now = time.time()
+        ttl = self._ttl_for(value)
+        if ttl > 0:
+            self.backend.set(key, now + ttl, value)
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.backend.sweep(now)
+
+    def flush(self) -> None:
+        self.backend.flush()
+
+    def flush_due(self) -> None:
+        self.backend.flush_due()
+
+    def close(self) -> None:
+        self.backend.close()
@@ -0,0 +1,496 @@
+"""Compiled form of CMS_SIGNATURES and TECH_SIGNATURES for the detection hot path.
+
+``compile_signatures`` flattens the signature dicts once at import. Every
+CMS and every other technology becomes a row, every check gets an integer
+ID, checks are grouped by type, header checks are keyed by header name,
+and cookie patterns share one prefilter. Matching a page then yields a set
+of check IDs for all rows at once. As a 0/1 mask over check IDs it is
+scored with one product against a row-by-check weight matrix; a stack of
+masks scores a whole corpus the same way.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from collections.abc import Callable, Iterable, Mapping
+
+import numpy as np
+
+from cms_signatures import CMS_SIGNATURES, TECH_SIGNATURES
+
+# Check types that are plain regex searches over the raw HTML body.
+# "script" and "meta" signals live in the HTML body too.
+HTML_CHECK_TYPES = frozenset({"html", "script", "meta"})
+
+# Escapes like \d or \S change meaning when lowercased, and inline flags
+# or named groups cannot be spliced into a shared alternation, so patterns
+# using them are not folded and fall back to their own compiled regex.
+_UNFOLDABLE_RE = re.compile(r"\\[A-Za-z0-9]|\(\?[a-zA-Z<-]")
+
+# Characters with a meaning of their own at the start of a pattern.
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]\\|()")
+
+# Largest leading character class _grouped_alternation splits into branches.
+_MAX_LEADING_CLASS = 4
+
+# Hits that only re-find already-matched checks before match_html narrows
+# its alternation to the checks still unmatched.
+_NARROW_AFTER_WASTED_HITS = 64
+
+
+def _merged_prefilter(patterns: Iterable[re.Pattern]) -> re.Pattern | None:
+    """One regex matching wherever any of ``patterns`` could match.
+
+    IGNORECASE only widens a case-sensitive pattern, so the merge is a safe
+    prefilter. Returns None when there is nothing to merge or the patterns
+    cannot share one regex (e.g. inline global flags).
+    """
+    sources = [f"(?:{p.pattern})" for p in patterns]
+    if not sources:
+        return None
+    try:
+        return re.compile("|".join(sources), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _leading_literal(source: str) -> tuple[str, str] | None:
+    """Split a pattern into its mandatory first character(s) and the rest.
+
+    The first element must be a plain (or escaped) character, or a small
+    class of them such as ``[/"']``, occurring exactly once; the returned
+    string holds every character it can be. None when the pattern starts
+    otherwise or has a top-level ``|``.
+    """
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return None
+        i += 1
+    if source[:1] == "[":
+        firsts = ""
+        i = 1
+        while i < len(source) and source[i] != "]":
+            ch = source[i]
+            if ch == "\\" and i + 1 < len(source) and not source[i + 1].isalnum():
+                ch = source[i + 1]
+                i += 1
+            elif ch in "^-\\":
+                return None
+            firsts += ch
+            i += 1
+        if not firsts or len(firsts) > _MAX_LEADING_CLASS or i >= len(source):
+            return None
+        rest = source[i + 1 :]
+    elif source[:1] == "\\" and len(source) > 1 and not source[1].isalnum():
+        firsts, rest = source[1], source[2:]
+    elif source and source[0] not in _REGEX_SPECIAL:
+        firsts, rest = source[0], source[1:]
+    else:
+        return None
+    if rest[:1] in ("*", "+", "?", "{"):
+        return None
+    return firsts, rest
+
+
+def _grouped_alternation(sources: Iterable[str]) -> str:
+    """Alternation of ``sources`` with branches grouped by first character.
+
+    The regex engine tries every branch at each position whose character
+    could start one, so a flat alternation slows down with every pattern
+    added. Grouped, a position tries only the branches sharing its first
+    character; a pattern led by a small class joins the group of each of
+    its characters. The set of positions that match is unchanged.
+    """
+    groups: dict[str, list[str]] = {}
+    loose: list[str] = []
+    for source in sources:
+        split = _leading_literal(source)
+        if split is None:
+            loose.append(source)
+            continue
+        firsts, rest = split
+        for first in dict.fromkeys(firsts):
+            groups.setdefault(first, []).append(rest)
+    branches = [
+        re.escape(first) + (rests[0] if len(rests) == 1 else f"(?:{'|'.join(rests)})")
+        for first, rests in groups.items()
+    ]
+    return "|".join(branches + loose)
+
+
+class SignatureIndex:
+    """Checks of the signature dicts, indexed by type with integer check IDs.
+
+    Rows are the CMSes, in signature order, followed by the technologies
+    of each category; a CMS ID is its row ID.
+
+    Attributes:
+        cms_names: CMS names in signature order; a CMS ID indexes this.
+        n_cms: number of CMS rows.
+        names: name of each row.
+        categories: category of each row ("cms" for CMS rows).
+        category_rows: category -> row IDs of its technologies, CMSes excluded.
+        checks: every check dict; a check ID indexes this.
+        check_row: row ID of each check.
+        weights: weight of each check.
+        row_check_ids: check IDs of each row, in signature order.
+        weight_matrix: (row, check) array of weights, zero where the check
+            belongs to another row.
+        max_scores: sum of check weights of each row (array), probe checks
+            excluded: a homepage alone can reach 100% confidence.
+        header_checks: lowercased header name -> [(check ID, pattern)].
+        cookie_checks: [(check ID, pattern)] for cookie checks.
+        generator_checks: [(check ID, pattern)] for meta generator checks.
+        probe_checks: [(check ID, path, pattern)] for probe checks.
+        cms_probe_ids: probe check IDs of each CMS, heaviest first.
+        html_check_ids: IDs of every check matched against the HTML body.
+    """
+
+    def __init__(
+        self,
+        signatures: Mapping[str, list[dict]],
+        technologies: Mapping[str, Mapping[str, list[dict]]] | None = None,
+    ) -> None:
+        self.cms_names: list[str] = list(signatures)
+        self.n_cms = len(self.cms_names)
+        self.names: list[str] = list(self.cms_names)
+        self.categories: list[str] = ["cms"] * self.n_cms
+        self.category_rows: dict[str, list[int]] = {}
+        rows = list(signatures.values())
+        for category, named in (technologies or {}).items():
+            for name, checks in named.items():
+                self.category_rows.setdefault(category, []).append(len(self.names))
+                self.names.append(name)
+                self.categories.append(category)
+                rows.append(checks)
+
+        self.checks: list[dict] = []
+        self.check_row: list[int] = []
+        self.weights: list[int] = []
+        self.row_check_ids: list[list[int]] = []
+        self.header_checks: dict[str, list[tuple[int, re.Pattern]]] = {}
+        self.cookie_checks: list[tuple[int, re.Pattern]] = []
+        self.generator_checks: list[tuple[int, re.Pattern]] = []
+        self.probe_checks: list[tuple[int, str, re.Pattern]] = []
+        self._folded_html: dict[int, str] = {}
+        self._fallback_html: dict[int, re.Pattern] = {}
+
+        for row_id, checks in enumerate(rows):
+            ids = []
+            for check in checks:
+                check_id = len(self.checks)
+                ids.append(check_id)
+                self.checks.append(check)
+                self.check_row.append(row_id)
+                self.weights.append(check["weight"])
+                self._add_check(check_id, check)
+            self.row_check_ids.append(ids)
+
+        n_checks = len(self.checks)
+        self.weight_matrix = np.zeros((len(self.names), n_checks), dtype=np.int64)
+        self.weight_matrix[self.check_row, np.arange(n_checks)] = self.weights
+        homepage = np.ones(n_checks, dtype=np.int64)
+        homepage[[cid for cid, _, _ in self.probe_checks]] = 0
+        self.max_scores: np.ndarray = self.weight_matrix @ homepage
+        self.cms_probe_ids: list[list[int]] = [
+            sorted(
+                (cid for cid in ids if self.checks[cid]["type"] == "probe"),
+                key=lambda cid: -self.weights[cid],
+            )
+            for ids in self.row_check_ids[: self.n_cms]
+        ]
+        self.html_check_ids = frozenset(self._folded_html) | frozenset(self._fallback_html)
+        self._folded_res = {cid: re.compile(src) for cid, src in self._folded_html.items()}
+        self._all_folded = self._combined_matcher(frozenset(self._folded_html))
+        self._cookie_prefilter = _merged_prefilter(p for _, p in self.cookie_checks)
+
+        # Byte-level twins of the pure-ASCII HTML checks, for scanning a body
+        # before it is decoded. Other checks wait for the decoded text.
+        self._folded_bytes = {
+            cid: src.encode("ascii") for cid, src in self._folded_html.items() if src.isascii()
+        }
+        self._folded_bytes_res = {cid: re.compile(src) for cid, src in self._folded_bytes.items()}
+        self._all_folded_bytes = self._combined_bytes_matcher(frozenset(self._folded_bytes))
+        self._fallback_bytes: dict[int, re.Pattern] = {}
+        for cid, pattern in self._fallback_html.items():
+            if pattern.pattern.isascii():
+                try:
+                    self._fallback_bytes[cid] = re.compile(
+                        pattern.pattern.encode("ascii"), pattern.flags & ~re.UNICODE
+                    )
+                except re.error:
+                    pass
+
+    def _add_check(self, check_id: int, check: dict) -> None:
+        check_type = check["type"]
+        pattern = check["pattern"]
+        if check_type == "header":
+            name = check.get("header_name", "").lower()
+            self.header_checks.setdefault(name, []).append((check_id, pattern))
+        elif check_type == "cookie":
+            self.cookie_checks.append((check_id, pattern))
+        elif check_type == "meta_generator":
+            self.generator_checks.append((check_id, pattern))
+        elif check_type == "probe":
+            self.probe_checks.append((check_id, check["path"], pattern))
+        elif check_type in HTML_CHECK_TYPES:
+            if pattern.flags & re.IGNORECASE and not _UNFOLDABLE_RE.search(pattern.pattern):
+                # Matched, without IGNORECASE, against a lowercased page.
+                self._folded_html[check_id] = pattern.pattern.lower()
+            else:
+                self._fallback_html[check_id] = pattern
+
+    # ---------- Scoring ----------
+
+    def mask(self, check_ids: Iterable[int]) -> np.ndarray:
+        """0/1 vector over check IDs with the given checks set."""
+        mask = np.zeros(len(self.checks), dtype=np.int64)
+        mask[list(check_ids)] = 1
+        return mask
+
+    def score(self, masks: np.ndarray) -> np.ndarray:
+        """Per-row scores of one mask, or of a (pages, checks) stack of masks."""
+        return masks @ self.weight_matrix.T
+
+    def confidences(self, scores: np.ndarray) -> np.ndarray:
+        """Confidence 0-100 of each score: its share of the row's max score."""
+        ratio = scores / np.maximum(self.max_scores, 1) * 100
+        return np.minimum(100, ratio.astype(np.int64))
+
+    def contended(
+        self, matched: Iterable[int], pending: Iterable[int], threshold: int, margin: int = 0
+    ) -> frozenset[int]:
+        """The ``pending`` checks whose outcome can still change the result.
+
+        With ``matched`` scored and every pending check assumed to match, a
+        CMS stays in contention while that ceiling comes within ``margin``
+        of both the threshold and the best CMS score so far; only its
+        pending checks need evaluating. Every other CMS ends more than
+        ``margin`` below the winner whatever its pending checks find, so
+        the winner, its score and its signals come out as if everything had
+        been evaluated. Other technologies are each reported on their own,
+        so one stays in contention while its ceiling reaches the threshold.
+        """
+        pending = frozenset(pending)
+        if not pending:
+            return pending
+        scores = self.score(self.mask(matched))
+        ceilings = scores + self.score(self.mask(pending))
+        floors = np.full(len(self.names), threshold, dtype=np.int64)
+        floors[: self.n_cms] = max(int(scores[: self.n_cms].max()), threshold) - margin
+        contenders = (ceilings >= floors).tolist()
+        check_row = self.check_row
+        return frozenset(cid for cid in pending if contenders[check_row[cid]])
+
+    def ranked(self, scores: np.ndarray) -> list[dict]:
+        """All CMSes with score and confidence, best first (ties in signature order)."""
+        confidences = self.confidences(scores).tolist()
+        scores = scores[: self.n_cms]
+        score_list = scores.tolist()
+        order = np.argsort(-scores, kind="stable").tolist()
+        return [
+            {
+                "cms": self.cms_names[cms_id],
+                "score": score_list[cms_id],
+                "confidence": confidences[cms_id],
+            }
+            for cms_id in order
+        ]
+
+    def detected(self, scores: np.ndarray, threshold: int) -> dict[str, list[int]]:
+        """Category -> row IDs of its technologies scoring at least ``threshold``, best first."""
+        score_list = scores.tolist()
+        return {
+            category: sorted(
+                (row_id for row_id in rows if score_list[row_id] >= max(threshold, 1)),
+                key=lambda row_id: -score_list[row_id],
+            )
+            for category, rows in self.category_rows.items()
+        }
+
+    # ---------- Matching ----------
+
+    def match_headers(self, headers: Mapping[str, str]) -> set[int]:
+        """IDs of header checks matching ``headers`` (one probe per header)."""
+        matched: set[int] = set()
+        for name, value in headers.items():
+            if not value:
+                continue
+            for check_id, pattern in self.header_checks.get(name.lower(), ()):
+                if pattern.search(value):
+                    matched.add(check_id)
+        return matched
+
+    def match_cookies(self, names: Iterable[str], raw_set_cookies: Iterable[str]) -> set[int]:
+        """IDs of cookie checks matching any cookie name or raw Set-Cookie."""
+        matched: set[int] = set()
+        if not self.cookie_checks:
+            return matched
+        prefilter = self._cookie_prefilter
+        for text in (*names, *raw_set_cookies):
+            # Most cookies match nothing; one merged search rules them out.
+            if prefilter is not None and not prefilter.search(text):
+                continue
+            for check_id, pattern in self.cookie_checks:
+                if check_id not in matched and pattern.search(text):
+                    matched.add(check_id)
+        return matched
+
+    def match_generator(self, content: str | None) -> set[int]:
+        """IDs of meta generator checks matching the generator content."""
+        if not content:
+            return set()
+        return {check_id for check_id, pattern in self.generator_checks if pattern.search(content)}
+
+    def match_probes(self, probes: Mapping[str, tuple[int, str]]) -> set[int]:
+        """IDs of probe checks matching fetched probes (path -> (status, body))."""
+        matched: set[int] = set()
+        for check_id, path, pattern in self.probe_checks:
+            probe = probes.get(path)
+            if probe is not None and 200 <= probe[0] < 300 and pattern.search(probe[1]):
+                matched.add(check_id)
+        return matched
+
+    def match_html(
+        self, html: str, skip: Iterable[int] = frozenset(), only: Iterable[int] | None = None
+    ) -> set[int]:
+        """Scan the HTML body once and return the IDs of all matching checks.
+
+        Checks listed in ``skip`` (e.g. already matched earlier) are not
+        tried. With ``only``, just those checks are, and the scan searches
+        for nothing else.
+        """
+        matched: set[int] = set()
+        if not html:
+            return matched
+        skip = frozenset(skip)
+
+        remaining = frozenset(self._folded_html).difference(skip)
+        matcher = self._all_folded
+        if only is not None:
+            only = frozenset(only)
+            skip |= self.html_check_ids - only
+            if not remaining <= only:
+                remaining &= only
+                if remaining:
+                    matcher = self._combined_matcher(remaining)
+        if remaining:
+            matched = self._scan_folded(
+                html.lower(), remaining, self._folded_res, matcher, self._combined_matcher
+            )
+
+        for check_id, pattern in self._fallback_html.items():
+            if check_id not in skip and pattern.search(html):
+                matched.add(check_id)
+        return matched
+
+    def match_html_bytes(self, body: bytes, skip: Iterable[int] = frozenset()) -> set[int]:
+        """``match_html`` over undecoded bytes, for the pure-ASCII checks only.
+
+        Only meaningful for ASCII-compatible encodings (UTF-8, Latin-1 and
+        the like). Checks with non-ASCII patterns are never reported, so the
+        result is a subset of what ``match_html`` finds on the decoded text.
+        """
+        matched: set[int] = set()
+        if not body:
+            return matched
+        skip = frozenset(skip)
+
+        remaining = frozenset(self._folded_bytes).difference(skip)
+        if remaining:
+            matched = self._scan_folded(
+                body.lower(),
+                remaining,
+                self._folded_bytes_res,
+                self._all_folded_bytes,
+                self._combined_bytes_matcher,
+            )
+
+        for check_id, pattern in self._fallback_bytes.items():
+            if check_id not in skip and pattern.search(body):
+                matched.add(check_id)
+        return matched
+
+    @staticmethod
+    def _scan_folded(
+        lowered: str | bytes,
+        remaining: frozenset[int],
+        patterns: Mapping[int, re.Pattern],
+        matcher: re.Pattern,
+        combine: Callable[[frozenset[int]], re.Pattern],
+    ) -> set[int]:
+        """Find which of the folded checks in ``remaining`` occur in ``lowered``.
+
+        The scan only moves forward. At every offset where ``matcher`` (the
+        alternation of folded checks) hits, each still-unmatched check is
+        tried at that exact offset (so overlapping patterns cannot mask each
+        other) and the scan resumes one character later. When
+        already-matched checks keep producing hits that find nothing new,
+        the alternation is narrowed to the remaining checks with
+        ``combine``, so a signature that recurs all over a large page stops
+        costing anything.
+        """
+        matched: set[int] = set()
+        pos = 0
+        wasted = 0
+        while remaining:
+            m = matcher.search(lowered, pos)
+            if m is None:
+                break
+            start = m.start()
+            hits = {cid for cid in remaining if patterns[cid].match(lowered, start)}
+            if hits:
+                matched |= hits
+                remaining -= hits
+            else:
+                wasted += 1
+                if wasted >= _NARROW_AFTER_WASTED_HITS:
+                    matcher = combine(remaining)
+                    wasted = 0
+            pos = start + 1
+        return matched
+
+    @functools.lru_cache(maxsize=256)
+    def _combined_matcher(self, check_ids: frozenset[int]) -> re.Pattern:
+        """Alternation of the given folded checks (cached per subset).
+
+        Compiling a large alternation costs milliseconds, so this is only
+        worth it once a page has shown repeated hits from matched checks.
+        """
+        # Bare "|" joins keep the first-character prefilter that wrapping
+        # each branch in a group would disable.
+        return re.compile(_grouped_alternation(self._folded_html[cid] for cid in sorted(check_ids)))
+
+    @functools.lru_cache(maxsize=256)
+    def _combined_bytes_matcher(self, check_ids: frozenset[int]) -> re.Pattern:
+        """``_combined_matcher`` for the byte-level checks."""
+        sources = (self._folded_bytes[cid].decode("ascii") for cid in sorted(check_ids))
+        return re.compile(_grouped_alternation(sources).encode("ascii"))
+
+
+def compile_signatures(
+    signatures: Mapping[str, list[dict]],
+    technologies: Mapping[str, Mapping[str, list[dict]]] | None = None,
+) -> SignatureIndex:
+    """Build the lookup tables for a CMS signature dict and, optionally, technologies by category."""
+    return SignatureIndex(signatures, technologies)
+
+
+# Index of the shipped signatures, built once at import.
+SIGNATURE_INDEX = compile_signatures(CMS_SIGNATURES, TECH_SIGNATURES)